@@ -1,12 +1,102 @@
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from utilities.startup import profile
+import asyncio
+import importlib
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from routes.youtube.youtube import yt_router
-from routes.subjects.subjects import subjects_router
-from routes.subjects.cards import cards_router
-from routes.generator import generator_router 
+from utilities.concurrency import shutdown_executors
+from utilities.database import close_database, get_database, pool_stats
+from utilities.cache import get_generation_cache
+from utilities.jobs import get_job_queue, run_worker
+from utilities.ratelimit import rate_limiter_stats
+from utilities.parsing import stats as parse_stats
+from utilities.log import get_logger
+from utilities.metrics import HTTP_REQUEST_SECONDS, register_collector, render
+from utilities.clients import get_clients
+from utilities.env import get_env
 
-app = FastAPI()
+env = get_env()
+log = get_logger("app")
+
+# Route group -> (module, router attribute); each is mounted under /<group>.
+ROUTE_GROUPS = {
+    "videos": ("routes.youtube.youtube", "yt_router"),
+    "subjects": ("routes.subjects.subjects", "subjects_router"),
+    "cards": ("routes.subjects.cards", "cards_router"),
+    "generator": ("routes.generator", "generator_router"),
+    "materials": ("routes.materials.materials", "materials_router"),
+}
+
+unknown = set(env.ROUTE_GROUPS) - set(ROUTE_GROUPS)
+if unknown:
+    raise ValueError(f"Unknown ROUTE_GROUPS: {sorted(unknown)}")
+
+routes = {}
+for group in env.ROUTE_GROUPS:
+    with profile.phase(f"import:{group}"):
+        routes[group] = importlib.import_module(ROUTE_GROUPS[group][0])
+
+
+def register_clients(clients):
+    """Build shared SDK clients and agent templates (importing their SDKs)."""
+    for group, module in routes.items():
+        register = getattr(module, "register_clients", None)
+        if register is None:
+            continue
+        try:
+            with profile.phase(f"clients:{group}"):
+                register(clients)
+        except Exception as e:
+            log.error("client init failed", module=module.__name__, error=str(e))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The process's one Mongo client, opened before traffic and closed last.
+    get_database()
+    clients = get_clients()
+    # "background" takes traffic at once and builds clients meanwhile: the
+    # first requests may wait on an SDK import, but the worker is up in a
+    # fraction of the time. "lazy" leaves every client to its first request.
+    warmup = None
+    if env.CLIENT_WARMUP == "startup":
+        register_clients(clients)
+    elif env.CLIENT_WARMUP == "background":
+        warmup = asyncio.create_task(asyncio.to_thread(register_clients, clients))
+    if "subjects" in routes:
+        try:
+            with profile.phase("indexes"):
+                await routes["subjects"].ensure_indexes()
+        except Exception as e:
+            log.error("subject index setup failed", error=str(e))
+
+    # In-process job workers; set JOB_WORKERS=0 when running `python worker.py`.
+    stop = asyncio.Event()
+    workers = []
+    if "cards" in routes:
+        workers = [
+            asyncio.create_task(
+                run_worker(get_job_queue(), routes["cards"].JOB_HANDLERS, stop)
+            )
+            for _ in range(env.JOB_WORKERS)
+        ]
+    profile.ready()
+    log.info("startup complete", groups=list(routes), **profile.report())
+    yield
+    if warmup is not None:
+        await warmup
+    stop.set()
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    clients.close()
+    shutdown_executors()
+    close_database()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,10 +106,114 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.include_router(yt_router, prefix="/videos")
-app.include_router(subjects_router, prefix="/subjects")
-app.include_router(cards_router, prefix="/cards")
-app.include_router(generator_router, prefix="/generator")
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # The route template, not the raw path, keeps label cardinality bounded.
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status),
+        )
+
+
+def collect_app_stats():
+    generation = get_generation_cache().stats()
+    yield (
+        "equilearn_generation_cache_lookups_total",
+        "counter",
+        "Generation cache lookups by result.",
+        {
+            (("result", "memory_hit"),): generation["hits"]["memory"],
+            (("result", "mongo_hit"),): generation["hits"]["mongo"],
+            (("result", "miss"),): generation["misses"],
+        },
+    )
+    yield (
+        "equilearn_generation_cache_hit_ratio",
+        "gauge",
+        "Share of generation cache lookups served from cache.",
+        {(): generation["hit_ratio"]},
+    )
+
+    if "videos" in routes:
+        videos = routes["videos"].search_cache.stats()
+        yield (
+            "equilearn_youtube_cache_lookups_total",
+            "counter",
+            "YouTube search cache lookups by result.",
+            {
+                (("result", "hit"),): videos["hits"],
+                (("result", "miss"),): videos["misses"],
+                (("result", "coalesced"),): videos["coalesced"],
+            },
+        )
+        yield (
+            "equilearn_youtube_quota_saved_total",
+            "counter",
+            "YouTube Data API quota units saved by caching and coalescing.",
+            {(): videos["quota_saved"]},
+        )
+
+    if "subjects" in routes:
+        subjects = routes["subjects"].subject_cache.stats()
+        yield (
+            "equilearn_subject_cache_lookups_total",
+            "counter",
+            "Subject read cache lookups by result.",
+            {
+                (("result", "hit"),): subjects["hits"],
+                (("result", "miss"),): subjects["misses"],
+                (("result", "coalesced"),): subjects["coalesced"],
+            },
+        )
+        yield (
+            "equilearn_subject_not_modified_total",
+            "counter",
+            "Subject reads answered 304 Not Modified.",
+            {(): subjects["not_modified"]},
+        )
+        yield (
+            "equilearn_subject_version_checks_total",
+            "counter",
+            "Projected subjectsVersion reads confirming cached subjects.",
+            {(): subjects["version_checks"]},
+        )
+
+    yield (
+        "equilearn_parse_items_total",
+        "counter",
+        "Structured-output parser events.",
+        {(("event", event),): count for event, count in parse_stats.items()},
+    )
+
+    limiters = rate_limiter_stats()
+    for field, name, kind, help in (
+        ("factor", "factor", "gauge", "Share of the configured rate limit allowed."),
+        ("queued", "queued", "gauge", "Calls waiting for rate limiter capacity."),
+        ("rate_limited", "rate_limited_total", "counter", "Provider 429s seen."),
+        ("wait_seconds", "wait_seconds_total", "counter", "Time calls waited."),
+    ):
+        yield (
+            f"equilearn_rate_limiter_{name}",
+            kind,
+            help,
+            {(("provider", name),): stats[field] for name, stats in limiters.items()},
+        )
+
+
+register_collector(collect_app_stats)
+
+for group, module in routes.items():
+    app.include_router(getattr(module, ROUTE_GROUPS[group][1]), prefix=f"/{group}")
 
 
 @app.get("/")
@@ -27,3 +221,28 @@ async def healthcheck():
     return JSONResponse(
         status_code=200, content={"message": "All Modules loaded Successfully"}
     )
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/cache-stats")
+async def cache_stats():
+    return JSONResponse(status_code=200, content=get_generation_cache().stats())
+
+
+@app.get("/rate-limits")
+async def rate_limits():
+    return JSONResponse(status_code=200, content=rate_limiter_stats())
+
+
+@app.get("/startup-profile")
+async def startup_profile():
+    return JSONResponse(status_code=200, content=profile.report())
+
+
+@app.get("/db-pool")
+async def db_pool():
+    return JSONResponse(status_code=200, content=pool_stats.stats())
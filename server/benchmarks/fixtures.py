@@ -0,0 +1,113 @@
+"""Synthetic PDF and PPTX documents for the benchmarks.
+
+Content is generated from a fixed seed, so a corpus built twice is identical
+and runs stay comparable. Every page carries unique text, so chunking and
+deduplication work the way they would on a real lecture deck.
+"""
+
+import os
+import random
+from typing import Dict, List
+import pptx
+
+WORDS = (
+    "process thread memory kernel scheduler page cache disk file system network "
+    "packet socket protocol latency throughput queue stack heap pointer register "
+    "instruction pipeline branch compiler parser token grammar tree graph vertex "
+    "edge matrix vector tensor gradient model training inference dataset sample "
+    "variance bias entropy signal filter frequency sensor circuit voltage current"
+).split()
+
+LINES_PER_PAGE = 30
+SIZES = (5, 50, 200)
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 14))]
+    return " ".join(words).capitalize() + "."
+
+
+def _page_lines(rng: random.Random, number: int) -> List[str]:
+    return [f"Section {number}: {rng.choice(WORDS).title()}"] + [
+        _sentence(rng) for _ in range(LINES_PER_PAGE - 1)
+    ]
+
+
+def write_pdf(path: str, pages: int, seed: int = 0):
+    """A plain PDF with one Helvetica text stream per page; no PDF library needed."""
+    rng = random.Random(seed)
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # filled in once the page tree exists
+    tree = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    kids = []
+    for number in range(1, pages + 1):
+        commands = ["BT", "/F1 10 Tf", "12 TL", "50 760 Td"]
+        for line in _page_lines(rng, number):
+            commands.append(f"({line}) Tj T*")
+        commands.append("ET")
+        stream = "\n".join(commands).encode("latin-1")
+        contents = add(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+        kids.append(
+            add(
+                b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+                b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+                % (tree, font, contents)
+            )
+        )
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % tree
+    objects[tree - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids),
+        len(kids),
+    )
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        catalog,
+        xref,
+    )
+    with open(path, "wb") as target:
+        target.write(output)
+
+
+def write_pptx(path: str, slides: int, seed: int = 0):
+    rng = random.Random(seed)
+    presentation = pptx.Presentation()
+    layout = presentation.slide_layouts[1]  # title and content
+    for number in range(1, slides + 1):
+        lines = _page_lines(rng, number)
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.title.text = lines[0]
+        # Slides hold less text than pages.
+        slide.placeholders[1].text = "\n".join(lines[1:8])
+    presentation.save(path)
+
+
+def build_corpus(directory: str, sizes=SIZES) -> Dict[str, str]:
+    """Write (or reuse) one PDF and one PPTX per size; returns name -> path."""
+    os.makedirs(directory, exist_ok=True)
+    corpus = {}
+    for size in sizes:
+        for extension, write in (("pdf", write_pdf), ("pptx", write_pptx)):
+            name = f"{extension}_{size}"
+            path = os.path.join(directory, f"{name}.{extension}")
+            if not os.path.exists(path):
+                write(path, size, seed=size)
+            corpus[name] = path
+    return corpus
@@ -0,0 +1,366 @@
+"""Load-test the API against stub backends and report latency, throughput and RSS.
+
+    python -m benchmarks.run                      # every scenario
+    python -m benchmarks.run --only upload_pdf    # scenarios whose name matches
+    python -m benchmarks.run --json after.json --baseline before.json
+
+The server runs in a child process (`benchmarks.serve`) so the load generator
+does not share its GIL; peak RSS is sampled from that process and its parse
+workers while each scenario runs. Save a run with --json and pass it as
+--baseline to a later run to see the change per scenario.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+import httpx
+from benchmarks.fixtures import SIZES, build_corpus
+from benchmarks.stubs import SEED_EMAIL, SEED_SUBJECTS, bench_email
+
+Request = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+TASK_TYPES = ("content", "flashcards", "quiz")
+VIDEO_QUERIES = 20
+
+
+def upload(path: str) -> Request:
+    with open(path, "rb") as source:
+        body = source.read()
+    name = os.path.basename(path)
+
+    async def request(client: httpx.AsyncClient, index: int) -> httpx.Response:
+        return await client.post("/cards/upload/", files={"file": (name, body)})
+
+    return request
+
+
+async def generate_task(client: httpx.AsyncClient, index: int) -> httpx.Response:
+    return await client.post(
+        "/generator/generate-task",
+        json={
+            "subject": "Operating Systems",
+            "lesson_name": f"Lesson {index}",
+            "topics": ["Processes", "Scheduling", "Memory"],
+            "task_type": TASK_TYPES[index % len(TASK_TYPES)],
+        },
+    )
+
+
+async def generate_tasks(client: httpx.AsyncClient, index: int) -> httpx.Response:
+    return await client.post(
+        "/generator/generate-tasks",
+        json={
+            "subject": "Operating Systems",
+            "lesson_name": f"Combined lesson {index}",
+            "topics": ["Processes", "Scheduling", "Memory"],
+        },
+    )
+
+
+async def create_subjects(client: httpx.AsyncClient, index: int) -> httpx.Response:
+    return await client.post(
+        "/subjects/create",
+        json={
+            "email": bench_email(index),
+            "subjects": [
+                {
+                    "name": f"Subject {index}-{n}",
+                    "description": "Benchmark subject.",
+                    "topics": [f"Topic {t}" for t in range(5)],
+                }
+                for n in range(3)
+            ],
+        },
+    )
+
+
+async def list_subjects(client: httpx.AsyncClient, index: int) -> httpx.Response:
+    return await client.get("/subjects/subjects", params={"email": SEED_EMAIL})
+
+
+async def get_subject(client: httpx.AsyncClient, index: int) -> httpx.Response:
+    return await client.get(
+        f"/subjects/{SEED_EMAIL}/seed-subject-{index % SEED_SUBJECTS}"
+    )
+
+
+async def youtube_videos(client: httpx.AsyncClient, index: int) -> httpx.Response:
+    return await client.get(
+        "/videos/youtube-videos", params={"query": f"topic {index % VIDEO_QUERIES}"}
+    )
+
+
+async def materials_page(client: httpx.AsyncClient, index: int) -> httpx.Response:
+    kind = ("flashcards", "notes")[index % 2]
+    return await client.get(
+        f"/materials/{SEED_EMAIL}/seed-subject-0/lesson-0/{kind}", params={"limit": 20}
+    )
+
+
+def build_scenarios(corpus: Dict[str, str]) -> Dict[str, Request]:
+    scenarios = {f"upload_{name}": upload(path) for name, path in corpus.items()}
+    scenarios.update(
+        {
+            "generate_task": generate_task,
+            "generate_tasks": generate_tasks,
+            "subjects_create": create_subjects,
+            "subjects_list": list_subjects,
+            "subject_get": get_subject,
+            "youtube_videos": youtube_videos,
+            "materials_page": materials_page,
+        }
+    )
+    return scenarios
+
+
+class RssSampler:
+    """Peak resident memory of a process and its descendants, from /proc (Linux only).
+
+    PDF/PPTX parsing runs in spawned worker processes, so the server's own
+    RSS alone would leave out exactly the memory uploads cost.
+    """
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def _children(pid: int) -> List[int]:
+        children = []
+        try:
+            for task in os.listdir(f"/proc/{pid}/task"):
+                with open(f"/proc/{pid}/task/{task}/children") as source:
+                    children.extend(int(child) for child in source.read().split())
+        except OSError:
+            pass
+        return children
+
+    @staticmethod
+    def _rss_kb(pid: int) -> Optional[int]:
+        try:
+            with open(f"/proc/{pid}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except OSError:
+            return None
+        return None
+
+    def _read_kb(self) -> Optional[int]:
+        total = None
+        pending = [self.pid]
+        while pending:
+            pid = pending.pop()
+            rss = self._rss_kb(pid)
+            if rss is None:
+                continue
+            total = (total or 0) + rss
+            pending.extend(self._children(pid))
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = self._read_kb()
+            if rss is not None:
+                self.peak_kb = max(self.peak_kb or 0, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, int(round(fraction * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    request: Request,
+    requests: int,
+    concurrency: int,
+) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = 0
+    indexes = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for index in indexes:
+            started = time.perf_counter()
+            try:
+                response = await request(client, index)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rps": requests / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def start_server(args) -> subprocess.Popen:
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.serve",
+        "--port",
+        str(args.port),
+        "--llm-latency",
+        str(args.llm_latency),
+        "--llm-items",
+        str(args.llm_items),
+        "--notes-chars",
+        str(args.notes_chars),
+        "--youtube-latency",
+        str(args.youtube_latency),
+    ]
+    if args.mongo_uri:
+        command += ["--mongo-uri", args.mongo_uri]
+    if args.warm_cache:
+        command.append("--warm-cache")
+    return subprocess.Popen(command, cwd=os.path.dirname(os.path.dirname(__file__)))
+
+
+def wait_until_ready(base_url: str, server: subprocess.Popen, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("benchmark server exited during startup")
+        try:
+            if httpx.get(f"{base_url}/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError("benchmark server did not start in time")
+
+
+def print_report(results: Dict[str, Dict], baseline: Optional[Dict[str, Dict]]):
+    header = f"{'scenario':<20} {'n':>5} {'err':>4} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak MB':>8}"
+    if baseline:
+        header += f" {'Δp95':>8} {'Δrps':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, result in results.items():
+        rss = result["peak_rss_mb"]
+        line = (
+            f"{name:<20} {result['requests']:>5} {result['errors']:>4} "
+            f"{result['rps']:>8.2f} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+            f"{result['p99_ms']:>9.1f} {rss if rss is not None else '-':>8}"
+        )
+        before = (baseline or {}).get(name)
+        if before:
+            line += f" {change(before['p95_ms'], result['p95_ms']):>8}"
+            line += f" {change(before['rps'], result['rps']):>8}"
+        print(line)
+
+
+def change(before: float, after: float) -> str:
+    if not before:
+        return "-"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+async def run(args) -> Dict[str, Dict]:
+    corpus = build_corpus(args.corpus_dir, sizes=args.sizes)
+    scenarios = build_scenarios(corpus)
+    if args.only:
+        scenarios = {
+            name: request
+            for name, request in scenarios.items()
+            if any(pattern in name for pattern in args.only)
+        }
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = start_server(args)
+    results = {}
+    try:
+        await asyncio.to_thread(wait_until_ready, base_url, server)
+        async with httpx.AsyncClient(
+            base_url=base_url,
+            timeout=args.timeout,
+            limits=httpx.Limits(max_connections=args.concurrency),
+        ) as client:
+            for name, request in scenarios.items():
+                requests = args.upload_requests if name.startswith("upload_") else args.requests
+                with RssSampler(server.pid) as rss:
+                    result = await run_scenario(client, request, requests, args.concurrency)
+                result["peak_rss_mb"] = (
+                    round(rss.peak_kb / 1024, 1) if rss.peak_kb is not None else None
+                )
+                results[name] = result
+                print(f"{name}: done", file=sys.stderr)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="*", help="run scenarios containing these")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--upload-requests", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--sizes", type=int, nargs="*", default=list(SIZES))
+    parser.add_argument(
+        "--corpus-dir",
+        default=os.path.join(tempfile.gettempdir(), "equilearn-bench-corpus"),
+    )
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-items", type=int, default=5)
+    parser.add_argument("--notes-chars", type=int, default=2000)
+    parser.add_argument("--youtube-latency", type=float, default=0.2)
+    parser.add_argument("--mongo-uri", help="use this mongod instead of mongomock")
+    parser.add_argument("--warm-cache", action="store_true")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare with results saved by --json")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as source:
+            baseline = json.load(source)
+
+    results = asyncio.run(run(args))
+    print_report(results, baseline)
+    if args.json:
+        with open(args.json, "w") as target:
+            json.dump(results, target, indent=2)
+
+
+if __name__ == "__main__":
+    main()
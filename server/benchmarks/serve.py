@@ -0,0 +1,38 @@
+"""Run the API against the stub backends: `python -m benchmarks.serve --port 8765`."""
+
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the app with stub backends.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-items", type=int, default=5)
+    parser.add_argument("--notes-chars", type=int, default=2000)
+    parser.add_argument("--youtube-latency", type=float, default=0.2)
+    parser.add_argument("--mongo-uri", help="use this mongod instead of mongomock")
+    parser.add_argument(
+        "--warm-cache", action="store_true", help="let the generation cache hit"
+    )
+    args = parser.parse_args()
+
+    from benchmarks import stubs
+
+    stubs.install(
+        llm_latency=args.llm_latency,
+        llm_items=args.llm_items,
+        notes_chars=args.notes_chars,
+        youtube_latency=args.youtube_latency,
+        mongo_uri=args.mongo_uri,
+        cold_cache=not args.warm_cache,
+    )
+
+    import uvicorn
+    from app import app
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
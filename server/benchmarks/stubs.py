@@ -0,0 +1,244 @@
+"""Deterministic local stand-ins for Gemini, Groq/crewAI, YouTube and Mongo.
+
+`install` must run before `app` is imported: `get_env()` reads the
+environment once per process, and the Mongo client is swapped before
+`get_database()` first builds it.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from types import SimpleNamespace
+from typing import Optional
+
+SEED_EMAIL = "seed@example.com"
+SEED_SUBJECTS = 20
+BENCH_USERS = 1000
+
+# Keys only need to be present; every provider call is stubbed.
+STUB_ENV = {
+    "GEMINI_API_KEY": "stub",
+    "GROQ_API_KEY": "stub",
+    "YOUTUBE_API_KEY": "stub",
+    "YOUTUBE_BASE_URL": "https://www.youtube.com/watch?v",
+    "DB_URI": "mongodb://localhost:27017",
+    "DB_NAME": "benchmark",
+    "JOB_WORKERS": "0",
+    # Warm clients before the port opens so no scenario overlaps the warm-up.
+    "CLIENT_WARMUP": "startup",
+    # Measure the server, not the provider quotas.
+    "GEMINI_RPM": "0",
+    "GEMINI_TPM": "0",
+    "GROQ_RPM": "0",
+    "GROQ_TPM": "0",
+    "LOG_LEVEL": "WARNING",
+    "LITELLM_LOCAL_MODEL_COST_MAP": "True",
+}
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:10]
+
+
+class StubOutput:
+    """Study material sized by `items` and `notes_chars`, unique per prompt."""
+
+    def __init__(self, items: int, notes_chars: int):
+        self.items = items
+        self.notes_chars = notes_chars
+
+    def flashcards(self, seed: str) -> list:
+        return [
+            {"question": f"What is concept {seed}-{i}?", "answer": f"Answer {i} " * 8}
+            for i in range(self.items)
+        ]
+
+    def quiz(self, seed: str) -> list:
+        return [
+            {
+                "question": f"Which statement about {seed}-{i} holds?",
+                "options": [f"{letter}) option {i}" for letter in "ABCD"],
+                "correct_answer": "A",
+            }
+            for i in range(self.items)
+        ]
+
+    def notes(self, seed: str) -> str:
+        line = f"- note about {seed}\n"
+        return f"# Notes {seed}\n" + line * max(1, self.notes_chars // len(line))
+
+    def for_prompt(self, prompt: str) -> str:
+        seed = _digest(prompt)
+        if '"flashcards": an array' in prompt:
+            return json.dumps(
+                {
+                    "flashcards": self.flashcards(seed),
+                    "quiz": self.quiz(seed),
+                    "notes": self.notes(seed),
+                }
+            )
+        if "flashcards" in prompt.lower():
+            return json.dumps(self.flashcards(seed))
+        if "quiz" in prompt.lower():
+            return json.dumps(self.quiz(seed))
+        return self.notes(seed)
+
+
+class StubGeminiModel:
+    def __init__(self, output: StubOutput, latency: float):
+        self.output = output
+        self.latency = latency
+
+    def generate_content(self, prompt: str, **kwargs):
+        time.sleep(self.latency)
+        text = self.output.for_prompt(prompt)
+        prompt_tokens, completion_tokens = len(prompt) // 4, len(text) // 4
+        return SimpleNamespace(
+            text=text,
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=prompt_tokens,
+                candidates_token_count=completion_tokens,
+                total_token_count=prompt_tokens + completion_tokens,
+            ),
+        )
+
+
+def _usage(prompt: str, text: str) -> SimpleNamespace:
+    prompt_tokens, completion_tokens = len(prompt) // 4, len(text) // 4
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+    )
+
+
+def bench_email(index: int) -> str:
+    return f"bench-{index % BENCH_USERS}@example.com"
+
+
+def seed_users():
+    """Users normally come from the frontend's Prisma schema; create them directly."""
+    from utilities.database import get_database
+
+    users = get_database().User.collection
+    users.delete_many({"email": {"$regex": "@example\\.com$"}})
+    users.insert_many(
+        [{"email": bench_email(i), "subjects": []} for i in range(BENCH_USERS)]
+        + [
+            {
+                "email": SEED_EMAIL,
+                "subjects": [
+                    {
+                        "name": f"Seed Subject {i}",
+                        "description": "Seeded for read benchmarks.",
+                        "topics": [f"Topic {i}-{t}" for t in range(8)],
+                        "slug": f"seed-subject-{i}",
+                    }
+                    for i in range(SEED_SUBJECTS)
+                ],
+            }
+        ]
+    )
+
+
+def seed_materials():
+    """Stored flashcards and notes for the seed user's first subject."""
+    from utilities.materials import Lesson, get_material_store
+
+    output = StubOutput(items=200, notes_chars=40000)
+    lesson = Lesson.of(SEED_EMAIL, "Seed Subject 0", "Lesson 0", "seed-subject-0")
+    asyncio.run(
+        get_material_store().save(
+            lesson,
+            {"flashcards": output.flashcards("seed"), "notes": output.notes("seed")},
+        )
+    )
+
+
+def install(
+    llm_latency: float = 0.5,
+    llm_items: int = 5,
+    notes_chars: int = 2000,
+    youtube_latency: float = 0.2,
+    mongo_uri: Optional[str] = None,
+    cold_cache: bool = True,
+):
+    """Patch every external backend; `mongo_uri` uses a real mongod instead of mongomock."""
+    for key, value in STUB_ENV.items():
+        os.environ.setdefault(key, value)
+    if mongo_uri:
+        os.environ["DB_URI"] = mongo_uri
+
+    from utilities import database
+
+    if not mongo_uri:
+        import mongomock
+
+        # An in-memory server in place of the process's client.
+        client = mongomock.MongoClient()
+        database.MongoClient = lambda *args, **kwargs: client
+
+    output = StubOutput(llm_items, notes_chars)
+
+    from routes.subjects import cards
+
+    cards.genai.configure = lambda **kwargs: None
+    cards.genai.GenerativeModel = lambda name: StubGeminiModel(output, llm_latency)
+
+    from routes import generator
+
+    def kickoff(crew):
+        time.sleep(llm_latency)
+        task = crew.tasks[0]
+        text = output.for_prompt(task.description)
+        return SimpleNamespace(raw=text, token_usage=_usage(task.description, text))
+
+    async def acompletion(messages, stream=False, **kwargs):
+        await asyncio.sleep(llm_latency)
+        prompt = "".join(message["content"] for message in messages)
+        text = output.for_prompt(prompt)
+        if not stream:
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+                usage=_usage(prompt, text),
+            )
+
+        async def deltas():
+            for start in range(0, len(text), 16):
+                yield SimpleNamespace(
+                    choices=[
+                        SimpleNamespace(
+                            delta=SimpleNamespace(content=text[start : start + 16])
+                        )
+                    ]
+                )
+
+        return deltas()
+
+    generator.crewai.Crew.kickoff = kickoff
+    generator.litellm.acompletion = acompletion
+
+    from routes.youtube import youtube
+
+    def search(service, http=None, q="", maxResults=10, **kwargs):
+        time.sleep(youtube_latency)
+        seed = _digest(q)
+        return {"items": [{"id": {"videoId": f"{seed}{i}"}} for i in range(maxResults)]}
+
+    youtube.build_youtube = lambda: SimpleNamespace()
+    youtube.search = search
+
+    if cold_cache:
+        from utilities.cache import GenerationCache
+
+        # Every generation reaches the (stub) model, as for new documents.
+        async def miss(self, key):
+            self.misses += 1
+            return None
+
+        GenerationCache.get = miss
+
+    seed_users()
+    seed_materials()
@@ -1,30 +1,63 @@
 # routes/generator.py
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict
-import os
+from typing import TYPE_CHECKING, Any, AsyncIterator, List, Dict, Optional, Tuple
 import json
-from dotenv import load_dotenv
-from crewai import Agent, Task, Process, LLM, Crew
+import asyncio
+from utilities.concurrency import retry_with_backoff, run_blocking, API_POOL
+from utilities.cache import get_generation_cache, make_cache_key
+from utilities.sse import sse_event, SSE_HEADERS
+from utilities.clients import ClientRegistry, get_clients
+from utilities.dedup import deduplicate
+from utilities.chunking import estimate_tokens
+from utilities.ratelimit import GROQ, get_rate_limiter
+from utilities.env import get_env
+from utilities.lazy import lazy_import
+from utilities.log import get_logger
+from utilities.materials import Lesson, save_materials
+from utilities.metrics import llm_call, record_llm_usage
+from utilities.parsing import parse_items
+from utilities.parsing import stats as parse_stats
+from schemas.schema import Flashcard, QuizQuestion
 
-# Load environment variables
-load_dotenv()
+if TYPE_CHECKING:
+    from crewai import Crew, Task
 
-# Check for GROQ_API_KEY
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-if not GROQ_API_KEY:
-    raise Exception("GROQ_API_KEY environment variable is not set")
+# crewAI and litellm take seconds to import; they load on first use instead.
+crewai = lazy_import("crewai")
+litellm = lazy_import("litellm")
+
+env = get_env()
+log = get_logger('generator')
 
 
 # -------------------
 # LLM Initialization
 # -------------------
-groq_llm = LLM(
-    model="groq/llama3-70b-8192",
-    temperature=0.7,
-    max_tokens=1500
-)
+MODEL_NAME = "groq/llama3-70b-8192"
+# Bump whenever an agent or task prompt changes so cached results are not reused.
+PROMPT_VERSION = "1"
+
+TEMPERATURE = 0.7
+MAX_TOKENS = 1500
+# crewAI's verbose mode prints whole prompts and answers to stdout, outside
+# the sampled structured logs; only turn it on when debugging.
+VERBOSE = env.LOG_LEVEL == "DEBUG"
+
+GROQ_LLM_CLIENT = 'groq.llm'
+
+
+def build_groq_llm():
+    return crewai.LLM(
+        model=MODEL_NAME,
+        temperature=TEMPERATURE,
+        max_tokens=MAX_TOKENS
+    )
+
+
+TASK_TYPES = ('content', 'flashcards', 'quiz')
 
 
 # -------------------
@@ -34,6 +67,10 @@ class StudyMaterialRequest(BaseModel):
     subject: str
     lesson_name: str
     topics: List[str]
+    # When set, the generated materials are stored for this user's lesson,
+    # under the subject with this stored slug (else the one named `subject`).
+    email: Optional[str] = None
+    subject_slug: Optional[str] = None
 
 class TaskRequest(StudyMaterialRequest):
     task_type: str  # 'content', 'flashcards', or 'quiz'
@@ -41,56 +78,170 @@ class TaskRequest(StudyMaterialRequest):
 class TaskResponse(BaseModel):
     task_type: str
     result: Dict
+    saved: Optional[Dict[str, int]] = None
+
+class MultiTaskRequest(StudyMaterialRequest):
+    task_types: List[str] = list(TASK_TYPES)
+
+class MultiTaskResponse(BaseModel):
+    results: Dict
+    errors: Dict[str, str]
+    saved: Optional[Dict[str, int]] = None
+
+
+# Item schemas for the JSON array task types, and how many items each asks for.
+ITEM_TYPES = {'flashcards': Flashcard, 'quiz': QuizQuestion}
+EXPECTED_ITEMS = {'flashcards': 5}
+
+
+def is_rate_limited(error: Exception) -> bool:
+    # crewAI re-raises provider errors, sometimes only as their message.
+    return isinstance(error, litellm.RateLimitError) or "rate limit" in str(error).lower()
+
+
+async def limited_completion(messages: List[Dict], stream: bool = False):
+    """A direct Groq completion, paced by the process-wide Groq limiter."""
+    limiter = get_rate_limiter(GROQ)
+    prompt = "".join(message["content"] for message in messages)
+    reserved = await limiter.acquire(estimate_tokens(prompt) + MAX_TOKENS)
+    try:
+        with llm_call('groq'):
+            response = await litellm.acompletion(
+                model=MODEL_NAME,
+                messages=messages,
+                temperature=TEMPERATURE,
+                max_tokens=MAX_TOKENS,
+                stream=stream,
+            )
+    except Exception as e:
+        if is_rate_limited(e):
+            limiter.rate_limited()
+        raise
+    usage = None if stream else getattr(response, 'usage', None)
+    if usage:
+        record_llm_usage('groq', usage.prompt_tokens, usage.completion_tokens)
+    limiter.succeeded(reserved, usage.total_tokens if usage else None)
+    return response
+
+
+def task_messages(task: "Task", extra: str = "") -> List[Dict]:
+    """A task's agent persona and instructions as plain chat messages."""
+    return [
+        {
+            "role": "system",
+            "content": f"You are {task.agent.role}. {task.agent.backstory}\n"
+            f"Your personal goal is: {task.agent.goal}",
+        },
+        {
+            "role": "user",
+            "content": f"{task.description}\n\n"
+            f"This is the expected criteria for your final answer: {task.expected_output}"
+            f"{extra}",
+        },
+    ]
+
+
+# -------------------
+# Agent Templates
+# -------------------
+# Built once per process and copied per request: a crewAI Agent keeps its
+# executor on the instance, so one agent must not run in two crews at once.
+def build_content_agent():
+    return crewai.Agent(
+        role='Content Creator',
+        goal='Create comprehensive and engaging lesson content in markdown format',
+        backstory="""You are an expert educational content creator...""",
+        tools=[],
+        llm=get_clients().get(GROQ_LLM_CLIENT, build_groq_llm),
+        verbose=VERBOSE
+    )
+
+def build_flashcard_agent():
+    return crewai.Agent(
+        role='Flashcard Creator',
+        goal='Create effective flashcards for memorization and quick review',
+        backstory="""You are a specialist in creating memorable...""",
+        tools=[],
+        llm=get_clients().get(GROQ_LLM_CLIENT, build_groq_llm),
+        verbose=VERBOSE
+    )
+
+def build_quiz_agent():
+    return crewai.Agent(
+        role='Quiz Creator',
+        goal='Create challenging but fair multiple choice quizzes',
+        backstory="""You are an experienced assessment designer...""",
+        tools=[],
+        llm=get_clients().get(GROQ_LLM_CLIENT, build_groq_llm),
+        verbose=VERBOSE
+    )
+
+AGENT_TEMPLATES = {
+    'agent:content': build_content_agent,
+    'agent:flashcards': build_flashcard_agent,
+    'agent:quiz': build_quiz_agent,
+}
+
+def register_clients(clients: ClientRegistry):
+    if env.GROQ_API_KEY:
+        for name, factory in AGENT_TEMPLATES.items():
+            clients.get(name, factory)
+
+
+def get_groq_clients(clients: ClientRegistry = Depends(get_clients)) -> ClientRegistry:
+    """Checked per request, so a missing key only takes down these routes."""
+    if not env.GROQ_API_KEY:
+        raise HTTPException(status_code=503, detail="GROQ_API_KEY environment variable is not set")
+    return clients
 
 
 # -------------------
 # Generator Logic
 # -------------------
 class StudyMaterialGenerator:
-    def __init__(self, subject: str, lesson_name: str, topics: List[str]):
+    def __init__(
+        self,
+        subject: str,
+        lesson_name: str,
+        topics: List[str],
+        clients: ClientRegistry = None,
+        email: Optional[str] = None,
+        subject_slug: Optional[str] = None
+    ):
         self.subject = subject
         self.lesson_name = lesson_name
         self.topics = topics
+        self.clients = clients or get_clients()
+        self.cache = get_generation_cache()
+        self.email = email
+        self.subject_slug = subject_slug
+
+    def cache_key(self, task_type: str) -> str:
+        request = {
+            "subject": self.subject.strip().lower(),
+            "lesson_name": self.lesson_name.strip().lower(),
+            "topics": [topic.strip().lower() for topic in self.topics],
+        }
+        return make_cache_key(task_type, request, PROMPT_VERSION, MODEL_NAME)
 
     def create_content_agent(self):
-        return Agent(
-            role='Content Creator',
-            goal='Create comprehensive and engaging lesson content in markdown format',
-            backstory="""You are an expert educational content creator...""",
-            tools=[],
-            llm=groq_llm,
-            verbose=True
-        )
+        return self.clients.get('agent:content', build_content_agent).copy()
 
     def create_flashcard_agent(self):
-        return Agent(
-            role='Flashcard Creator',
-            goal='Create effective flashcards for memorization and quick review',
-            backstory="""You are a specialist in creating memorable...""",
-            tools=[],
-            llm=groq_llm,
-            verbose=True
-        )
+        return self.clients.get('agent:flashcards', build_flashcard_agent).copy()
 
     def create_quiz_agent(self):
-        return Agent(
-            role='Quiz Creator',
-            goal='Create challenging but fair multiple choice quizzes',
-            backstory="""You are an experienced assessment designer...""",
-            tools=[],
-            llm=groq_llm,
-            verbose=True
-        )
+        return self.clients.get('agent:quiz', build_quiz_agent).copy()
 
     def create_content_task(self):
-        return Task(
+        return crewai.Task(
             description=f"""Create a moderately detailed lesson on {self.lesson_name} ...""",
             agent=self.create_content_agent(),
             expected_output="Markdown formatted lesson content with sections for each topic"
         )
 
     def create_flashcards_task(self):
-        return Task(
+        return crewai.Task(
             description=(
                 f"Create 5 flashcards for {self.lesson_name} as a JSON array of objects. "
                 "Each object should have the following two fields: 'question' and 'answer'.\n\n"
@@ -112,7 +263,7 @@ class StudyMaterialGenerator:
         )
 
     def create_quiz_task(self):
-        return Task(
+        return crewai.Task(
             description=(
                 f"Create a multiple choice quiz for {self.lesson_name} as a JSON array of objects.\n\n"
                 "Each quiz question should have:\n"
@@ -139,35 +290,194 @@ class StudyMaterialGenerator:
         )
 
 
+    def create_task(self, task_type: str) -> "Task":
+        """The crewAI task (and agent) for a task type.
+
+        Blocking: the first call may import crewAI and build the agent
+        templates, or wait for a warm-up doing so; go through `build_task`.
+        """
+        if task_type == 'content':
+            return self.create_content_task()
+        if task_type == 'flashcards':
+            return self.create_flashcards_task()
+        if task_type == 'quiz':
+            return self.create_quiz_task()
+        raise ValueError(f"Invalid task type: {task_type}")
+
+    def create_crew(self, task_type: str) -> Tuple["Crew", "Task"]:
+        task = self.create_task(task_type)
+        crew = crewai.Crew(
+            agents=[task.agent],
+            tasks=[task],
+            process=crewai.Process.sequential,
+            verbose=VERBOSE
+        )
+        return crew, task
+
+    async def build_task(self, task_type: str) -> "Task":
+        return await run_blocking(API_POOL, self.create_task, task_type)
+
+    async def kickoff(self, crew: "Crew", task: "Task"):
+        """Run a crew under the shared Groq limiter, retrying on rate limits.
+
+        Waits and backoff happen on the event loop; an API pool thread is only
+        taken for the crew run itself.
+        """
+        limiter = get_rate_limiter(GROQ)
+        prompt = task.description + task.agent.backstory + task.expected_output
+
+        def run():
+            with llm_call('groq'):
+                return crew.kickoff()
+
+        def usage(output) -> int:
+            tokens = output.token_usage
+            record_llm_usage('groq', tokens.prompt_tokens, tokens.completion_tokens)
+            return tokens.total_tokens
+
+        return await retry_with_backoff(
+            lambda: limiter.call(
+                run,
+                tokens=estimate_tokens(prompt) + MAX_TOKENS,
+                is_rate_limited=is_rate_limited,
+                usage=usage,
+            ),
+            should_retry=is_rate_limited,
+            retries=env.LLM_MAX_RETRIES,
+        )
+
     async def execute_task(self, task_type: str) -> Dict:
+        key = self.cache_key(task_type)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return cached
+
         try:
+            # Kept off the event loop: see create_task.
+            crew, task = await run_blocking(API_POOL, self.create_crew, task_type)
+            result = await self.kickoff(crew, task)
+
+            # Only the raw text is kept so results can be cached and shared.
             if task_type == 'content':
-                task = self.create_content_task()
-            elif task_type == 'flashcards':
-                task = self.create_flashcards_task()
-            elif task_type == 'quiz':
-                task = self.create_quiz_task()
+                output = {task_type: {'raw': result.raw}}
             else:
-                raise ValueError(f"Invalid task type: {task_type}")
+                output = {task_type: await self.finalize_items(task_type, result.raw)}
+            await self.cache.set(key, output)
+            return output
 
-            crew = Crew(
-                agents=[task.agent],
-                tasks=[task],
-                process=Process.sequential,
-                verbose=True
-            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
-            result = crew.kickoff()
+    async def finalize_items(self, task_type: str, raw: str) -> Dict:
+        """
+        Salvage, validate and deduplicate a flashcards/quiz array from crew output.
 
-            if task_type == 'content':
-                return {'content': result}
-            elif task_type == 'flashcards':
-                return {'flashcards': result}
-            else:  # quiz
-                return {'quiz': result}
+        Items lost to truncation or validation (or missing from the requested
+        count) are asked for once more instead of rerunning the whole crew. Output
+        with no usable items is passed through raw, as before.
+        """
+        parsed = parse_items(raw, ITEM_TYPES[task_type])
+        if not parsed.items:
+            return {'raw': raw}
+
+        items = parsed.items
+        missing = parsed.missing(EXPECTED_ITEMS.get(task_type, 0))
+        if missing:
+            items = items + await self.request_missing_items(task_type, items, missing)
+        items, merged = deduplicate(items)
+        return {'raw': json.dumps(items), 'duplicates_merged': merged}
 
+    async def request_missing_items(self, task_type: str, items: List[Dict], missing: int) -> List[Dict]:
+        task = await self.build_task(task_type)
+        questions = "\n".join(f"- {item['question']}" for item in items)
+        extra = (
+            f"\n\nOnly {missing} more item(s) are needed. Return exactly {missing} new "
+            f"item(s) in the same JSON array format, not repeating these questions:\n{questions}"
+        )
+        parse_stats["repair_requests"] += 1
+        try:
+            response = await limited_completion(task_messages(task, extra))
         except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+            log.warning("missing item request failed", task_type=task_type, error=str(e))
+            return []
+        repaired = parse_items(response.choices[0].message.content or "", ITEM_TYPES[task_type])
+        parse_stats["items_repaired"] += len(repaired.items[:missing])
+        return repaired.items[:missing]
+
+    async def execute_tasks(self, task_types: List[str]) -> MultiTaskResponse:
+        """
+        Run several task types' crews concurrently for one lesson.
+
+        Each crew runs on its own API pool thread, so the lesson takes as long as
+        its slowest artifact. A failed task is reported in `errors` without
+        discarding the ones that succeeded.
+        """
+        task_types = list(dict.fromkeys(task_types))
+        outputs = await asyncio.gather(
+            *(self.execute_task(task_type) for task_type in task_types),
+            return_exceptions=True
+        )
+
+        results, errors = {}, {}
+        for task_type, output in zip(task_types, outputs):
+            if isinstance(output, HTTPException):
+                errors[task_type] = output.detail
+            elif isinstance(output, Exception):
+                errors[task_type] = str(output)
+            else:
+                results.update(output)
+        return MultiTaskResponse(results=results, errors=errors)
+
+    async def save(self, results: Dict[str, Dict]) -> Optional[Dict[str, int]]:
+        """Store task results for the requesting user's lesson, if one was named."""
+        if not self.email:
+            return None
+        materials: Dict[str, Any] = {}
+        for task_type, output in results.items():
+            if task_type == 'content':
+                materials[task_type] = output.get('raw')
+                continue
+            # Output that never parsed is returned to the caller but not stored.
+            try:
+                items = json.loads(output.get('raw') or '')
+            except ValueError:
+                continue
+            if isinstance(items, list):
+                materials[task_type] = items
+        try:
+            lesson = Lesson.of(self.email, self.subject, self.lesson_name, self.subject_slug)
+        except ValueError as e:
+            # Generation already succeeded; like a failed write, this only
+            # means nothing is stored.
+            log.warning("not saving materials", email=self.email, error=str(e))
+            return None
+        return await save_materials(lesson, materials)
+
+    async def stream_content(self) -> AsyncIterator[str]:
+        """
+        Stream lesson content token by token straight from the Groq model.
+
+        Crew.kickoff only returns once the whole answer exists, so this sends the
+        content agent's persona and task to the LLM directly with streaming on.
+        """
+        key = self.cache_key('content')
+        cached = await self.cache.get(key)
+        if cached is not None:
+            yield cached['content']['raw']
+            return
+
+        response = await limited_completion(
+            task_messages(await self.build_task('content')), stream=True
+        )
+
+        parts = []
+        async for chunk in response:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+
+        await self.cache.set(key, {'content': {'raw': "".join(parts)}})
 
 
 # -------------------
@@ -176,18 +486,84 @@ class StudyMaterialGenerator:
 generator_router = APIRouter()
 
 @generator_router.post("/generate-task", response_model=TaskResponse)
-async def generate_single_task(request: TaskRequest):
+async def generate_single_task(request: TaskRequest, clients: ClientRegistry = Depends(get_groq_clients)):
     """
     Generate a single component of study materials (content, flashcards, or quiz)
     """
     generator = StudyMaterialGenerator(
         subject=request.subject,
         lesson_name=request.lesson_name,
-        topics=request.topics
+        topics=request.topics,
+        clients=clients,
+        email=request.email,
+        subject_slug=request.subject_slug
     )
 
     try:
         result = await generator.execute_task(request.task_type)
-        return TaskResponse(task_type=request.task_type, result=result)
+        saved = await generator.save(result)
+        return TaskResponse(task_type=request.task_type, result=result, saved=saved)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@generator_router.post("/generate-tasks", response_model=MultiTaskResponse)
+async def generate_multiple_tasks(request: MultiTaskRequest, clients: ClientRegistry = Depends(get_groq_clients)):
+    """
+    Generate several components (default: content, flashcards and quiz) in one call
+    """
+    invalid = [task_type for task_type in request.task_types if task_type not in TASK_TYPES]
+    if invalid or not request.task_types:
+        raise HTTPException(status_code=400, detail=f"Invalid task types: {invalid}")
+
+    generator = StudyMaterialGenerator(
+        subject=request.subject,
+        lesson_name=request.lesson_name,
+        topics=request.topics,
+        clients=clients,
+        email=request.email,
+        subject_slug=request.subject_slug
+    )
+    response = await generator.execute_tasks(request.task_types)
+    response.saved = await generator.save(response.results)
+    return response
+
+
+@generator_router.post("/generate-task/stream")
+async def generate_single_task_stream(request: TaskRequest, clients: ClientRegistry = Depends(get_groq_clients)):
+    """
+    Stream a single component as Server-Sent Events. 'content' is forwarded token
+    by token ('token' events); every task type ends with one 'result' event.
+    """
+    if request.task_type not in TASK_TYPES:
+        raise HTTPException(status_code=400, detail=f"Invalid task type: {request.task_type}")
+
+    generator = StudyMaterialGenerator(
+        subject=request.subject,
+        lesson_name=request.lesson_name,
+        topics=request.topics,
+        clients=clients,
+        email=request.email,
+        subject_slug=request.subject_slug
+    )
+
+    async def events():
+        try:
+            if request.task_type == 'content':
+                parts = []
+                async for delta in generator.stream_content():
+                    parts.append(delta)
+                    yield sse_event("token", {"text": delta})
+                result = {'content': {'raw': "".join(parts)}}
+            else:
+                result = await generator.execute_task(request.task_type)
+        except HTTPException as e:
+            yield sse_event("error", {"detail": e.detail})
+            return
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+            return
+        saved = await generator.save(result)
+        yield sse_event("result", {"task_type": request.task_type, "result": result, "saved": saved})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
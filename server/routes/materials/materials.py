@@ -0,0 +1,45 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse
+from utilities.materials import KINDS, get_material_store
+
+materials_router = APIRouter()
+
+MAX_PAGE_SIZE = 100
+
+
+@materials_router.get("/{email}/{subject}")
+async def list_lessons(email: str, subject: str):
+    """Stored lessons of a subject and how many items of each kind they hold."""
+    lessons = await get_material_store().lessons(email, subject)
+    return JSONResponse(status_code=200, content={"lessons": lessons})
+
+
+@materials_router.get("/{email}/{subject}/{lesson}/{kind}")
+async def get_materials(
+    email: str,
+    subject: str,
+    lesson: str,
+    kind: str,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """One page of stored flashcards, quiz questions, or notes/content sections.
+
+    Pass the returned `next_cursor` to get the following page; it is null on
+    the last one. Nothing here calls an LLM.
+    """
+    if kind not in KINDS:
+        raise HTTPException(status_code=400, detail=f"Invalid kind: {kind}")
+    try:
+        items, next_cursor = await get_material_store().page(
+            email, subject, lesson, kind, limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not items and cursor is None:
+        raise HTTPException(status_code=404, detail="No stored materials")
+    return JSONResponse(
+        status_code=200,
+        content={"kind": kind, "items": items, "next_cursor": next_cursor},
+    )
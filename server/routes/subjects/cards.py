@@ -1,25 +1,110 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
-from io import BytesIO
-import google.generativeai as genai
-from utilities.env import Env
+from fastapi import APIRouter, Depends, File, Form, UploadFile, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from utilities.env import get_env
+from utilities.concurrency import (
+    iterate_in_thread,
+    retry_with_backoff,
+    run_blocking,
+    API_POOL,
+    CPU_POOL,
+)
+from utilities.cache import get_generation_cache, make_cache_key
+from utilities.sse import sse_event, SSE_HEADERS
+from utilities.jobs import JobQueue, get_job_queue, COMPLETED
+from utilities.clients import ClientRegistry, get_clients
+from utilities.chunking import Chunker, TextUnit, estimate_tokens
+from utilities.documents import EXTRACTORS, iter_document_units
+from utilities.dedup import Deduplicator, deduplicate, question_key
+from utilities.lazy import lazy_import
+from utilities.log import get_logger, preview
+from utilities.materials import Lesson, save_materials
+from utilities.metrics import llm_call, record_llm_usage
+from utilities.ratelimit import BULK, GEMINI, get_rate_limiter, request_priority
+from utilities.parsing import ParsedItems, find_value, parse_items
+from utilities.parsing import stats as parse_stats
+from schemas.schema import Flashcard, QuizQuestion
 from typing import List, Dict
 import typing
-import PyPDF2
-import json
-import re
-import tqdm
-import pptx
+import asyncio
+import os
+import uuid
+import shutil
+import tempfile
+
+genai = lazy_import("google.generativeai")
+google_exceptions = lazy_import("google.api_core.exceptions")
 
 cards_router = APIRouter()
-env = Env()
+env = get_env()
+log = get_logger("cards")
+
+# Bump whenever a prompt below changes so cached generations are not reused.
+PROMPT_VERSION = "1"
+
+RATE_LIMIT_ERRORS = ("ResourceExhausted", "TooManyRequests", "ServiceUnavailable")
+
+
+# Item schemas for the JSON array artifacts, and how to ask for more of them.
+ITEM_TYPES = {"flashcards": Flashcard, "quiz": QuizQuestion}
+REPAIR_DESCRIPTIONS = {
+    "flashcards": "flashcards, each a dictionary with 'question' and 'answer' keys",
+    "quiz": (
+        "multiple-choice quiz questions, each a dictionary with 'question', "
+        "'options' (4 strings labeled \"A) \", \"B) \", \"C) \", \"D) \") and "
+        "'correct_answer' (a single letter A, B, C or D)"
+    ),
+}
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    return isinstance(
+        error, tuple(getattr(google_exceptions, name) for name in RATE_LIMIT_ERRORS)
+    )
+
+
+def log_generation(kind: str, prompt: str, response: str):
+    # Sizes always; text only at debug level, and only a preview of it.
+    log.info(
+        "llm generation",
+        sample=env.LOG_SAMPLE_RATE,
+        kind=kind,
+        prompt_chars=len(prompt),
+        response_chars=len(response),
+    )
+    log.debug(
+        "llm generation text",
+        kind=kind,
+        prompt=preview(prompt),
+        response=preview(response),
+    )
+
+
+def _tokens_used(response) -> int:
+    usage = response.usage_metadata
+    record_llm_usage("gemini", usage.prompt_token_count, usage.candidates_token_count)
+    return usage.total_token_count
 
 
 class StudyMaterialGenerator:
-    def __init__(self, api_key: str, model_name: str = "gemini-pro"):
+    def __init__(
+        self,
+        api_key: str,
+        model_name: str = "gemini-pro",
+        max_concurrency: int = env.LLM_CONCURRENCY,
+        max_retries: int = env.LLM_MAX_RETRIES,
+        combined: bool = env.LLM_COMBINED_PROMPT,
+    ):
         if not api_key:
             raise ValueError("Gemini API key is required")
 
+        self.model_name = model_name
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.combined = combined
+        self.chunker = Chunker.for_model(model_name)
+        self.cache = get_generation_cache()
+        self.limiter = get_rate_limiter(GEMINI)
+
         genai.configure(api_key=api_key)
 
         try:
@@ -27,7 +112,7 @@ class StudyMaterialGenerator:
         except Exception as e:
             raise RuntimeError(f"Failed to initialize Gemini model: {e}")
 
-    def _safe_generate(self, prompt: str, max_tokens: int = 2048) -> str:
+    async def _safe_generate(self, prompt: str, max_tokens: int = 2048) -> str:
         safety_settings = [
             {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
             {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
@@ -41,30 +126,72 @@ class StudyMaterialGenerator:
             "top_p": 0.9,
         }
 
+        def generate():
+            with llm_call("gemini"):
+                return self.model.generate_content(
+                    prompt,
+                    generation_config=generation_config,
+                    safety_settings=safety_settings,
+                )
+
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config,
-                safety_settings=safety_settings,
+            # Every attempt, retries included, waits its turn in the shared
+            # limiter before it takes an API pool thread.
+            response = await retry_with_backoff(
+                lambda: self.limiter.call(
+                    generate,
+                    tokens=estimate_tokens(prompt) + max_tokens,
+                    is_rate_limited=_is_rate_limited,
+                    usage=_tokens_used,
+                ),
+                should_retry=_is_rate_limited,
+                retries=self.max_retries,
             )
             return response.text
         except Exception as e:
-            print(f"Error generating content: {e}")
+            log.error("llm call failed", provider="gemini", error=str(e))
             return ""
 
-    def _split_text_into_chunks(self, text: str, max_length: int = 2000) -> List[str]:
-        chunks = []
-        while len(text) > max_length:
-            split_point = text.rfind(" ", max_length - 100, max_length)
-            if split_point == -1:
-                split_point = max_length
-            chunks.append(text[:split_point])
-            text = text[split_point:].strip()
-        if text:
-            chunks.append(text)
-        return chunks
-
-    def generate_flashcards(self, context: str) -> List[Dict[str, str]]:
+    def _split_text_into_chunks(self, text: str) -> List[str]:
+        return list(self.chunker.pack([TextUnit(text)]))
+
+    async def _complete_items(
+        self,
+        kind: str,
+        context: str,
+        response: typing.Union[str, ParsedItems],
+    ) -> List[Dict[str, typing.Any]]:
+        """Valid items of a response, topped up with a request for only the lost ones.
+
+        Items lost to truncation or failed validation are asked for once more,
+        listing the questions already kept; a response with no usable items at
+        all is returned empty so the chunk is retried as a whole.
+        """
+        parsed = (
+            response
+            if isinstance(response, ParsedItems)
+            else parse_items(response, ITEM_TYPES[kind])
+        )
+        missing = parsed.missing()
+        if not parsed.items or not missing:
+            return parsed.items
+
+        parse_stats["repair_requests"] += 1
+        questions = "\n".join(f"- {item['question']}" for item in parsed.items)
+        prompt = f"""Create a JSON array of {missing} more {REPAIR_DESCRIPTIONS[kind]} from the following content.
+        Do not repeat any of these questions:
+        {questions}
+
+        Content:
+        {context}
+
+        Return only the JSON array."""
+
+        repaired = parse_items(await self._safe_generate(prompt), ITEM_TYPES[kind])
+        parse_stats["items_repaired"] += len(repaired.items[:missing])
+        return parsed.items + repaired.items[:missing]
+
+    async def generate_flashcards(self, context: str) -> List[Dict[str, str]]:
         prompt = f"""Create a JSON array of flashcards from the following content.
         Each flashcard should be a dictionary with 'question' and 'answer' keys.
 
@@ -76,20 +203,11 @@ class StudyMaterialGenerator:
             {{"question": "...", "answer": "..."}}
         ]"""
 
-        print(f"Flashcard prompt: {prompt}")
-        response = self._safe_generate(prompt)
-        print(f"Flashcard response: {response}")
-        json_match = re.search(r"\[.*\]", response, re.DOTALL)
-        if json_match:
-            try:
-                return json.loads(json_match.group(0))
-            except json.JSONDecodeError as e:
-                print(f"JSONDecodeError: {e}")
-                print(f"Problematic response: {json_match.group(0)}")
-                return []
-        return []
-
-    def generate_quiz(self, context: str) -> List[Dict[str, str]]:
+        response = await self._safe_generate(prompt)
+        log_generation("flashcards", prompt, response)
+        return await self._complete_items("flashcards", context, response)
+
+    async def generate_quiz(self, context: str) -> List[Dict[str, str]]:
         prompt = f"""Create a JSON array of multiple-choice quiz questions from the following content.
         Each question should be a dictionary with 'question', 'options', and 'correct_answer' keys.
 
@@ -105,94 +223,444 @@ class StudyMaterialGenerator:
             }}
         ]"""
 
-        print(f"Quiz prompt: {prompt}")
-        response = self._safe_generate(prompt)
-        print(f"Quiz response: {response}")
-        json_match = re.search(r"\[.*\]", response, re.DOTALL)
-        if json_match:
-            try:
-                return json.loads(json_match.group(0))
-            except json.JSONDecodeError as e:
-                print(f"JSONDecodeError: {e}")
-                print(f"Problematic response: {json_match.group(0)}")
-                return []
-        return []
-
-    def generate_notes(self, context: str) -> str:
+        response = await self._safe_generate(prompt)
+        log_generation("quiz", prompt, response)
+        return await self._complete_items("quiz", context, response)
+
+    async def generate_notes(self, context: str) -> str:
         prompt = f"""Generate comprehensive, structured study notes from the following content.
         Use markdown formatting with headings, bullet points, and clear sections.
 
         Content:
         {context}"""
 
-        print(f"Notes prompt: {prompt}")
-        response = self._safe_generate(prompt)
-        print(f"Notes response: {response}")
+        response = await self._safe_generate(prompt)
+        log_generation("notes", prompt, response)
         return response
 
-    def process_large_text(self, text: str) -> typing.Dict[str, typing.Any]:
-        chunks = self._split_text_into_chunks(text)
-        print(f"Text chunks: {chunks}")
-        all_flashcards = []
-        all_quiz = []
-        all_notes = []
-
-        for chunk in chunks:
-            flashcards = self.generate_flashcards(chunk)
-            quiz = self.generate_quiz(chunk)
-            notes = self.generate_notes(chunk)
-
-            all_flashcards.extend(flashcards)
-            all_quiz.extend(quiz)
-            all_notes.append(notes)
-
-        return {
-            "flashcards": all_flashcards,
-            "quiz": all_quiz,
-            "notes": "\n".join(all_notes),
+    async def generate_combined(self, context: str) -> Dict[str, typing.Any]:
+        """One call for all three artifacts of a chunk.
+
+        Returns only the parts that parsed and validated; callers fall back to
+        the single-artifact prompts for whatever is missing.
+        """
+        prompt = f"""Create study material from the following content and return a single JSON object with exactly these keys:
+        - "flashcards": an array of objects with 'question' and 'answer' keys.
+        - "quiz": an array of multiple-choice questions, each with 'question', 'options' (4 strings labeled "A) ", "B) ", "C) ", "D) ") and 'correct_answer' (a single letter A, B, C or D).
+        - "notes": a string of comprehensive, structured study notes in markdown, with headings, bullet points, and clear sections.
+
+        Content:
+        {context}
+
+        Output format:
+        {{
+            "flashcards": [{{"question": "...", "answer": "..."}}],
+            "quiz": [
+                {{
+                    "question": "...",
+                    "options": ["A) ...", "B) ...", "C) ...", "D) ..."],
+                    "correct_answer": "A"
+                }}
+            ],
+            "notes": "..."
+        }}"""
+
+        response = await self._safe_generate(prompt)
+        log_generation("combined", prompt, response)
+        # Each artifact is salvaged on its own, so a response cut off in the
+        # notes still yields its flashcards and quiz.
+        parts = {}
+        for kind in ITEM_TYPES:
+            parsed = parse_items(response, ITEM_TYPES[kind], key=kind)
+            if parsed.found:
+                parts[kind] = await self._complete_items(kind, context, parsed)
+        notes = find_value(response, "notes")
+        if isinstance(notes, str):
+            parts["notes"] = notes
+        return parts
+
+    async def _cached_generate(self, kind: str, generate, chunk: str):
+        key = make_cache_key(kind, chunk, PROMPT_VERSION, self.model_name)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        result = await generate(chunk)
+        # Empty output means the call failed; let the next upload retry it.
+        if result:
+            await self.cache.set(key, result)
+        return result
+
+    async def _process_chunk(self, chunk: str) -> typing.Tuple[list, list, str]:
+        single = {
+            "flashcards": self.generate_flashcards,
+            "quiz": self.generate_quiz,
+            "notes": self.generate_notes,
         }
+        if not self.combined:
+            return await asyncio.gather(
+                *(self._cached_generate(kind, fn, chunk) for kind, fn in single.items())
+            )
+
+        key = make_cache_key("combined", chunk, PROMPT_VERSION, self.model_name)
+        parts = await self.cache.get(key)
+        if parts is None:
+            parts = await self.generate_combined(chunk)
+            missing = [kind for kind in single if kind not in parts]
+            if missing:
+                filled = await asyncio.gather(
+                    *(self._cached_generate(kind, single[kind], chunk) for kind in missing)
+                )
+                parts.update(zip(missing, filled))
+            # Empty output means a call failed; let the next upload retry it.
+            if all(parts.values()):
+                await self.cache.set(key, parts)
+
+        return parts["flashcards"], parts["quiz"], parts["notes"]
+
+    async def iter_chunk_results(
+        self, chunks: typing.Iterator[str]
+    ) -> typing.AsyncIterator[typing.Tuple[int, typing.Tuple[list, list, str]]]:
+        """Yield `(index, (flashcards, quiz, notes))` as each chunk finishes.
+
+        `chunks` may be a blocking iterator (e.g. fed by document extraction); it
+        is advanced on a worker thread, and no more than `max_concurrency` chunks
+        are held in flight at once, so memory stays bounded by the pool size.
+        Results arrive in completion order; `index` is the chunk's position.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        completed: asyncio.Queue = asyncio.Queue()
+        tasks = []
+
+        async def run(index: int, chunk: str):
+            try:
+                await completed.put(("chunk", index, await self._process_chunk(chunk)))
+            except Exception as e:
+                await completed.put(("error", index, e))
+            finally:
+                semaphore.release()
+
+        async def produce():
+            try:
+                async for chunk in iterate_in_thread(chunks):
+                    await semaphore.acquire()
+                    tasks.append(asyncio.create_task(run(len(tasks), chunk)))
+                await completed.put(("total", None, len(tasks)))
+            except Exception as e:
+                await completed.put(("error", None, e))
+
+        producer = asyncio.create_task(produce())
+        total = None
+        received = 0
+        try:
+            while total is None or received < total:
+                kind, index, payload = await completed.get()
+                if kind == "error":
+                    raise payload
+                if kind == "total":
+                    total = payload
+                    continue
+                received += 1
+                yield index, payload
+        finally:
+            producer.cancel()
+            for task in tasks:
+                task.cancel()
+
+    async def process_chunks(
+        self, chunks: typing.Iterator[str]
+    ) -> typing.Dict[str, typing.Any]:
+        """Generate material for every chunk and reassemble it in chunk order."""
+        results = {}
+        async for index, result in self.iter_chunk_results(chunks):
+            results[index] = result
+
+        return await run_blocking(
+            CPU_POOL, merge_chunk_results, [results[i] for i in range(len(results))]
+        )
+
+    async def process_large_text(self, text: str) -> typing.Dict[str, typing.Any]:
+        return await self.process_chunks(iter(self._split_text_into_chunks(text)))
+
+
+def merge_chunk_results(
+    results: typing.Iterable[typing.Sequence[typing.Any]],
+) -> typing.Dict[str, typing.Any]:
+    """Combine ordered per-chunk `(flashcards, quiz, notes)` into one response.
+
+    Repeated slides tend to yield the same questions, so flashcards and quiz
+    items are deduplicated across chunks and the merge counts reported.
+    """
+    all_flashcards = []
+    all_quiz = []
+    all_notes = []
+    for flashcards, quiz, notes in results:
+        all_flashcards.extend(flashcards)
+        all_quiz.extend(quiz)
+        all_notes.append(notes)
+
+    all_flashcards, flashcards_merged = deduplicate(all_flashcards)
+    all_quiz, quiz_merged = deduplicate(all_quiz)
+    return {
+        "flashcards": all_flashcards,
+        "quiz": all_quiz,
+        "notes": "\n".join(all_notes),
+        "duplicates_merged": {"flashcards": flashcards_merged, "quiz": quiz_merged},
+    }
+
+
+SPOOL_BLOCK_SIZE = 1024 * 1024
+
+
+async def _spool_upload(file: UploadFile, extension: str) -> typing.BinaryIO:
+    """Copy the upload into a temp file we own, in fixed-size blocks.
+
+    FastAPI closes the request's form files as soon as the handler returns, so
+    streamed responses cannot keep reading from `file` itself. The file is
+    named so parse workers in other processes can open it; closing deletes it.
+    """
+    spooled = tempfile.NamedTemporaryFile(suffix=f".{extension}")
+    await asyncio.to_thread(shutil.copyfileobj, file.file, spooled, SPOOL_BLOCK_SIZE)
+    spooled.seek(0)
+    return spooled
+
+
+GENERATOR_CLIENT = "cards.generator"
+
+
+def build_generator() -> StudyMaterialGenerator:
+    return StudyMaterialGenerator(api_key=env.GEMINI_API_KEY)
+
+
+def register_clients(clients: ClientRegistry):
+    if env.GEMINI_API_KEY:
+        clients.get(GENERATOR_CLIENT, build_generator)
+
+
+def get_generator(
+    clients: ClientRegistry = Depends(get_clients),
+) -> StudyMaterialGenerator:
+    """Shared generator: genai is configured and the model built once per process."""
+    try:
+        return clients.get(GENERATOR_CLIENT, build_generator)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _prepare_upload(
+    file: UploadFile, generator: StudyMaterialGenerator
+) -> typing.Tuple[typing.BinaryIO, typing.Iterator[str]]:
+    file_extension = file.filename.split(".")[-1].lower()
+    if file_extension not in EXTRACTORS:
+        raise HTTPException(status_code=400, detail="Unsupported file type")
+
+    spooled = await _spool_upload(file, file_extension)
+    return spooled, generator.chunker.pack(
+        iter_document_units(spooled.name, file_extension)
+    )
 
 
-def extract_text_from_pdf(pdf_stream: BytesIO) -> str:
-    """Extract text from a PDF file using a BytesIO stream."""
-    text = ""
-    reader = PyPDF2.PdfReader(pdf_stream)
-    for page in tqdm.tqdm(reader.pages, desc="Reading PDF pages"):
-        text += page.extract_text() or ""
-    print(f"Extracted text from PDF: {text}")
-    return text.strip()
+def lesson_form(
+    email: typing.Optional[str] = Form(None),
+    subject: typing.Optional[str] = Form(None),
+    lesson: typing.Optional[str] = Form(None),
+    subject_slug: typing.Optional[str] = Form(None),
+) -> typing.Optional[Lesson]:
+    """Optional owner of an upload's materials; when given, they are stored."""
+    try:
+        return Lesson.of(email, subject, lesson, subject_slug)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
-def extract_text_from_pptx(pptx_stream: BytesIO) -> str:
-    """Extract text from a PPTX file using a BytesIO stream."""
-    text = ""
-    presentation = pptx.Presentation(pptx_stream)
-    for slide in tqdm.tqdm(presentation.slides, desc="Reading PPTX slides"):
-        for shape in slide.shapes:
-            if hasattr(shape, "text"):
-                text += shape.text + "\n"
-    print(f"Extracted text from PPTX: {text}")
-    return text.strip()
+def upload_materials(
+    result: typing.Dict[str, typing.Any],
+) -> typing.Dict[str, typing.Any]:
+    return {kind: result[kind] for kind in ("flashcards", "quiz", "notes")}
 
 
 @cards_router.post("/upload/")
-async def upload_file(file: UploadFile = File(...)):
-    api_key = env.GEMINI_API_KEY
-    if not api_key:
-        raise HTTPException(status_code=400, detail="Gemini API key is required")
+async def upload_file(
+    file: UploadFile = File(...),
+    generator: StudyMaterialGenerator = Depends(get_generator),
+    lesson: typing.Optional[Lesson] = Depends(lesson_form),
+):
+    spooled, chunks = await _prepare_upload(file, generator)
+    with spooled:
+        result = await generator.process_chunks(chunks)
+    saved = await save_materials(lesson, upload_materials(result))
+    if saved is not None:
+        result["saved"] = saved
+    return JSONResponse(content=result)
 
-    generator = StudyMaterialGenerator(api_key=api_key)
-    print(f"StudyMaterialGenerator initialized with API key: {api_key}")
 
-    file_extension = file.filename.split(".")[-1].lower()
-    file_content = await file.read()
+@cards_router.post("/upload/stream")
+async def upload_file_stream(
+    file: UploadFile = File(...),
+    generator: StudyMaterialGenerator = Depends(get_generator),
+    lesson: typing.Optional[Lesson] = Depends(lesson_form),
+):
+    """Stream each chunk's flashcards, quiz and notes as Server-Sent Events."""
+    spooled, chunks = await _prepare_upload(file, generator)
+
+    async def events():
+        count = 0
+        # Items already sent in earlier chunks are filtered out of later ones.
+        seen_flashcards = Deduplicator(question_key)
+        seen_quiz = Deduplicator(question_key)
+        sent = {"flashcards": [], "quiz": [], "notes": {}}
+        try:
+            async for index, (flashcards, quiz, notes) in generator.iter_chunk_results(
+                chunks
+            ):
+                count += 1
+                chunk = {
+                    "flashcards": [f for f in flashcards if seen_flashcards.add(f)],
+                    "quiz": [q for q in quiz if seen_quiz.add(q)],
+                }
+                sent["flashcards"].extend(chunk["flashcards"])
+                sent["quiz"].extend(chunk["quiz"])
+                sent["notes"][index] = notes
+                yield sse_event("chunk", {"index": index, **chunk, "notes": notes})
+        except Exception as e:
+            yield sse_event("error", {"detail": str(e)})
+            return
+        finally:
+            spooled.close()
+        # Notes are stored in document order, whatever order chunks finished in.
+        sent["notes"] = "\n".join(sent["notes"][i] for i in sorted(sent["notes"]))
+        yield sse_event(
+            "done",
+            {
+                "chunks": count,
+                "duplicates_merged": {
+                    "flashcards": seen_flashcards.merged,
+                    "quiz": seen_quiz.merged,
+                },
+                "saved": await save_materials(lesson, sent),
+            },
+        )
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+
+UPLOAD_JOB = "cards.upload"
+
+
+async def process_upload_job(queue: JobQueue, job: typing.Dict[str, typing.Any]):
+    """Job handler: generate material for a stored upload, persisting each chunk."""
+    payload = job["payload"]
+    job_id, worker_id = job["_id"], job["worker"]
+    # Uploads processed in the background yield to interactive LLM calls.
+    request_priority.set(BULK)
+
+    def split() -> List[str]:
+        units = iter_document_units(payload["path"], payload["extension"])
+        return list(generator.chunker.pack(units))
+
+    try:
+        # Building the generator configures genai and may import it, or wait
+        # for a warm-up doing so; neither belongs on the event loop.
+        try:
+            generator = await run_blocking(
+                API_POOL, get_clients().get, GENERATOR_CLIENT, build_generator
+            )
+        except ValueError as e:
+            # The only ValueError here is a missing Gemini key.
+            raise RuntimeError("GEMINI_API_KEY is not set; uploads cannot be processed") from e
+        # Chunk text is small next to the document, and knowing the total up
+        # front gives pollers an exact percentage.
+        chunks = await asyncio.to_thread(split)
+        await queue.set_total(job_id, worker_id, len(chunks))
+        async for index, result in generator.iter_chunk_results(iter(chunks)):
+            await queue.record_result(job_id, worker_id, index, list(result))
+    finally:
+        # A worker that lost the job leaves the upload to whoever reclaimed it.
+        if await queue.owns(job_id, worker_id) and os.path.exists(payload["path"]):
+            os.remove(payload["path"])
+
+    # Chunks recorded by an earlier claim of this job count too.
+    results = (await queue.get(job_id))["results"]
+    merged = await run_blocking(CPU_POOL, merge_chunk_results, ordered_results(results))
+    await queue.set_result(job_id, worker_id, merged)
+    if payload.get("lesson"):
+        await save_materials(Lesson(**payload["lesson"]), upload_materials(merged))
+
+
+def ordered_results(results: typing.Dict[str, typing.Any]) -> List[typing.Any]:
+    """A job's per-chunk results (keyed by index string) in chunk order."""
+    return [results[index] for index in sorted(results, key=int)]
+
+
+JOB_HANDLERS = {UPLOAD_JOB: process_upload_job}
+
+
+@cards_router.post("/jobs", status_code=202)
+async def submit_upload_job(
+    file: UploadFile = File(...),
+    lesson: typing.Optional[Lesson] = Depends(lesson_form),
+):
+    """Queue an upload for background processing and return its job ID at once."""
+    if not env.GEMINI_API_KEY:
+        raise HTTPException(status_code=400, detail="Gemini API key is required")
 
-    if file_extension == "pdf":
-        text = extract_text_from_pdf(BytesIO(file_content))
-    elif file_extension == "pptx":
-        text = extract_text_from_pptx(BytesIO(file_content))
-    else:
+    file_extension = file.filename.split(".")[-1].lower()
+    if file_extension not in EXTRACTORS:
         raise HTTPException(status_code=400, detail="Unsupported file type")
 
-    result = generator.process_large_text(text)
-    return JSONResponse(content=result)
+    # Workers may live in other processes, so the upload goes to a shared path.
+    os.makedirs(env.JOB_UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(env.JOB_UPLOAD_DIR, f"{uuid.uuid4().hex}.{file_extension}")
+
+    def store():
+        with open(path, "wb") as target:
+            shutil.copyfileobj(file.file, target, SPOOL_BLOCK_SIZE)
+
+    await asyncio.to_thread(store)
+    job_id = await get_job_queue().enqueue(
+        UPLOAD_JOB,
+        {
+            "path": path,
+            "extension": file_extension,
+            "filename": file.filename,
+            "lesson": lesson._asdict() if lesson else None,
+        },
+    )
+    return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"})
+
+
+@cards_router.get("/jobs/{job_id}")
+async def get_upload_job(job_id: str):
+    job = await get_job_queue().get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    results = job.get("results", {})
+    result = job.get("result")
+    if result is None:
+        # Still running (or finished before results were stored): merge the
+        # partial output off the event loop.
+        result = await run_blocking(
+            CPU_POOL, merge_chunk_results, ordered_results(results)
+        )
+    total = job.get("total")
+    done = len(results)
+    if job["status"] == COMPLETED:
+        percent = 100.0
+    else:
+        percent = round(100 * done / total, 1) if total else 0.0
+
+    return JSONResponse(
+        status_code=200,
+        content={
+            "job_id": job_id,
+            "status": job["status"],
+            "percent_complete": percent,
+            "chunks_done": done,
+            "chunks_total": total,
+            "error": job.get("error"),
+            "result": result,
+        },
+    )
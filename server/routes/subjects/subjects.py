@@ -1,44 +1,293 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import hashlib
+import re
+import time
+import weakref
+from typing import Any, Dict, List, Optional
+import orjson
+from cachetools import TTLCache
+from fastapi import APIRouter, HTTPException, Request, Response
 from fastapi.responses import JSONResponse
-from routes.subjects.cards import StudyMaterialGenerator
-from utilities.database import Database
+from pymongo.errors import OperationFailure
+from utilities.concurrency import SingleFlight
+from utilities.database import get_database
 from schemas.schema import UserSubjects
 from slugify import slugify
-from utilities.slugify import generate_unique_slug, subject_exists
-from utilities.env import Env
-from googleapiclient.discovery import build
+from utilities.slugify import SlugIndex, subject_exists
+from utilities.env import get_env
+from utilities.log import get_logger
 
-db = Database()
 subjects_router = APIRouter()
-env = Env()
+env = get_env()
+log = get_logger("subjects")
+
+# Optimistic create: revalidate and retry this often if a concurrent request
+# changes the user's subjects between our read and our guarded write.
+CREATE_ATTEMPTS = 3
+# Creates for one user are serialized within a worker, so retries are only ever
+# needed for races with other worker processes.
+_create_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+class SubjectEntry:
+    """One user's subjects as last read, with each response body encoded once."""
+
+    def __init__(self, user: dict):
+        self.subjects = user.get("subjects", [])
+        self.by_slug = {sub.get("slug"): sub for sub in self.subjects}
+        self.list_body = orjson.dumps(
+            {"message": "Subjects Fetched", "subjects": self.subjects}
+        )
+        # Every create/delete here bumps the version; the digest also catches
+        # edits that bypass this API (the frontend writes through Prisma).
+        digest = hashlib.blake2b(self.list_body, digest_size=8).hexdigest()
+        self.version = user.get("subjectsVersion", 0)
+        self.etag = f'"{self.version}-{digest}"'
+        # When the version was last confirmed against Mongo.
+        self.checked_at = time.monotonic()
+        self._subject_bodies: Dict[str, bytes] = {}
+
+    def subject_body(self, slug: str) -> Optional[bytes]:
+        body = self._subject_bodies.get(slug)
+        if body is None and slug in self.by_slug:
+            body = orjson.dumps(
+                {"message": "Subject found", "subject": self.by_slug[slug]}
+            )
+            self._subject_bodies[slug] = body
+        return body
+
+
+class SubjectCache:
+    """TTL cache of each user's subjects for the polled read routes.
+
+    Create and delete drop the user's entry here and bump the user's
+    `subjectsVersion`. Within `fresh_for` of its last check an entry is served
+    as is, If-None-Match polls included, so a 304 costs no Mongo read; after
+    that the next hit confirms the version with a projected read. Writes
+    through other worker processes are therefore visible within `fresh_for`,
+    not immediately: read-after-write across processes is traded for
+    DB-free polling. Edits by the frontend's Prisma client do not bump the
+    version and are picked up when the entry expires. Concurrent misses (and
+    checks) for one user share a single Mongo read.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = env.SUBJECT_CACHE_SIZE,
+        ttl: int = env.SUBJECT_CACHE_TTL,
+        fresh_for: float = env.SUBJECT_CACHE_FRESH,
+    ):
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.fresh_for = fresh_for
+        self.flights = SingleFlight()
+        # Bumped by every invalidation: a read that overlapped a write must
+        # neither be stored nor be joined by readers arriving after it.
+        self.writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.version_checks = 0
+        self.not_modified = 0
+
+    async def _load(self, email: str, writes: int) -> Optional[SubjectEntry]:
+        user = await get_database().User.find_one(
+            {"email": email}, {"_id": 0, "subjects": 1, "subjectsVersion": 1}
+        )
+        if not user:
+            return None
+        entry = SubjectEntry(user)
+        if writes == self.writes:
+            self.memory[email] = entry
+        return entry
+
+    async def _current(self, email: str, entry: SubjectEntry) -> bool:
+        self.version_checks += 1
+        user = await get_database().User.find_one(
+            {"email": email}, {"_id": 0, "subjectsVersion": 1}
+        )
+        if user is None or user.get("subjectsVersion", 0) != entry.version:
+            return False
+        entry.checked_at = time.monotonic()
+        return True
+
+    async def get(self, email: str) -> Optional[SubjectEntry]:
+        entry = self.memory.get(email)
+        if entry is not None:
+            current = True
+            if time.monotonic() - entry.checked_at > self.fresh_for:
+                current = await self.flights.do(
+                    ("version", email, entry.etag), lambda: self._current(email, entry)
+                )
+            if current:
+                self.hits += 1
+                return entry
+            # Changed by another process since it was read.
+            if self.memory.get(email) is entry:
+                del self.memory[email]
+        self.misses += 1
+        writes = self.writes
+        return await self.flights.do(
+            (email, writes), lambda: self._load(email, writes)
+        )
+
+    def invalidate(self, email: str):
+        self.writes += 1
+        self.memory.pop(email, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "version_checks": self.version_checks,
+            "coalesced": self.flights.coalesced,
+            "not_modified": self.not_modified,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.memory),
+        }
+
+
+subject_cache = SubjectCache()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
+def cached_response(request: Request, etag: str, body: bytes) -> Response:
+    # no-cache: clients keep the body but revalidate on every poll.
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        subject_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def ensure_indexes():
+    """Indexes backing the subject lookups below.
+
+    Prisma already owns a unique index on `email`, which every query here starts
+    from. (email, subjects.slug) serves the slug-qualified filters. A unique
+    index cannot stop two array elements of one document from sharing a slug,
+    so that is enforced by the guarded updates in create_subject instead.
+    """
+    for keys, options in (
+        ([("email", 1)], {"unique": True, "name": "User_email_key"}),
+        ([("email", 1), ("subjects.slug", 1)], {"name": "email_subject_slug"}),
+    ):
+        try:
+            await get_database().User.create_index(keys, **options)
+        except OperationFailure as e:
+            # An equivalent index under another name already does the job.
+            log.info("skipping index", index=options["name"], reason=str(e))
+
+
+def _no_subject_like(names: List[str], slugs: List[str]) -> dict:
+    """Filter clause: no existing subject has one of these names (any case) or slugs."""
+    clashes = [
+        {"name": re.compile(f"^{re.escape(name)}$", re.IGNORECASE)} for name in names
+    ]
+    clashes.append({"slug": {"$in": slugs}})
+    return {"$not": {"$elemMatch": {"$or": clashes}}}
 
 
 @subjects_router.post("/create")
 async def create_subject(subject: UserSubjects):
-    user = db.User.find_one({"email": subject.email})
-    if not user:
-        return JSONResponse(status_code=404, content={"message": "User not found"})
-    existing_subjects = {sub.get("name").lower() for sub in user.get("subjects", [])}
-    existing_slugs = {sub.get("slug") for sub in user.get("subjects", [])}
-    for sub in subject.subjects:
-        if subject_exists(sub.name, existing_subjects):
+    """Add a batch of subjects in one write.
+
+    The whole payload is validated in memory (against the user's subjects and
+    against itself) and slugs come from a SlugIndex built once, then every
+    accepted subject is pushed with a single `$push: {$each: [...]}`; entries
+    that were rejected are reported back.
+    """
+    lock = _create_locks.setdefault(subject.email, asyncio.Lock())
+    async with lock:
+        return await _create_subjects(subject)
+
+
+async def _create_subjects(subject: UserSubjects):
+    for _ in range(CREATE_ATTEMPTS):
+        # Only names and slugs are needed, not every description and topic list.
+        user = await get_database().User.find_one(
+            {"email": subject.email},
+            {"_id": 0, "subjects.name": 1, "subjects.slug": 1},
+        )
+        if not user:
+            return JSONResponse(status_code=404, content={"message": "User not found"})
+        existing_subjects = {
+            sub.get("name").lower() for sub in user.get("subjects", [])
+        }
+        slugs = SlugIndex(sub.get("slug") for sub in user.get("subjects", []))
+
+        new_subjects = []
+        batch_subjects = set()
+        failed = []
+        for sub in subject.subjects:
+            if subject_exists(sub.name, existing_subjects):
+                failed.append({"name": sub.name, "reason": "Subject already exists."})
+                continue
+            if subject_exists(sub.name, batch_subjects):
+                failed.append(
+                    {"name": sub.name, "reason": "Duplicate subject in request."}
+                )
+                continue
+            batch_subjects.add(sub.name.lower())
+            new_subjects.append(
+                {
+                    "name": sub.name,
+                    "description": sub.description,
+                    "topics": sub.topics,
+                    "slug": slugs.allocate(slugify(sub.name)),
+                }
+            )
+
+        if not new_subjects:
             return JSONResponse(
                 status_code=409,
-                content={"message": f"Subject already exists."},
+                content={"message": f"Subject already exists.", "failed": failed},
             )
-        base_slug = slugify(sub.name)
-        unique_slug = generate_unique_slug(base_slug, existing_slugs)
-        new_subject = {
-            "name": sub.name,
-            "description": sub.description,
-            "topics": sub.topics,
-            "slug": unique_slug,
-        }
-        db.User.update_one(
-            {"email": subject.email}, {"$push": {"subjects": new_subject}}
+
+        # The filter re-checks names and slugs so a concurrent insert cannot slip
+        # in between the read above and this write; the batch lands all or
+        # nothing, and on a clash it is revalidated against the new state.
+        result = await get_database().User.update_one(
+            {
+                "email": subject.email,
+                "subjects": _no_subject_like(
+                    [sub["name"] for sub in new_subjects],
+                    [sub["slug"] for sub in new_subjects],
+                ),
+            },
+            {
+                "$push": {"subjects": {"$each": new_subjects}},
+                "$inc": {"subjectsVersion": 1},
+            },
         )
+        if result.modified_count:
+            subject_cache.invalidate(subject.email)
+            break
+    else:
+        return JSONResponse(
+            status_code=409,
+            content={"message": "Subjects changed concurrently, please retry."},
+        )
+
     return JSONResponse(
-        status_code=201, content={"message": "Subjects added successfully"}
+        status_code=201,
+        content={
+            "message": "Subjects added successfully",
+            "created": [
+                {"name": sub["name"], "slug": sub["slug"]} for sub in new_subjects
+            ],
+            "failed": failed,
+        },
     )
 
 
@@ -101,44 +350,38 @@ async def create_subject(subject: UserSubjects):
 #     )
 
 @subjects_router.get("/{email}/{slug}")
-async def get_subject(email: str, slug: str):
-    user = db.User.find_one({"email": email})
-    if not user:
+async def get_subject(email: str, slug: str, request: Request):
+    # Served from the user's cached subjects; the ETag covers all of them.
+    entry = await subject_cache.get(email)
+    if entry is None:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    subjects = user.get("subjects", [])
-    for subject in subjects:
-        if subject["slug"] == slug:
-            return JSONResponse(
-                status_code=200, 
-                content={
-                    "message": "Subject found",
-                    "subject": subject
-                }
-            )
-    
+
+    body = entry.subject_body(slug)
+    if body is not None:
+        return cached_response(request, entry.etag, body)
+
     raise HTTPException(status_code=404, detail="Subject not found")
 
 @subjects_router.delete("/{email}/{slug}")
 async def delete_subject(email: str, slug: str):
-    user = db.User.find_one({"email": email})
-    if not user:
+    result = await get_database().User.update_one(
+        {"email": email, "subjects.slug": slug},
+        {"$pull": {"subjects": {"slug": slug}}, "$inc": {"subjectsVersion": 1}},
+    )
+    if result.modified_count:
+        subject_cache.invalidate(email)
+        return JSONResponse(
+            status_code=200, content={"message": "Subject deleted successfully"}
+        )
+    # Nothing matched; one projected probe tells which 404 to return.
+    if not await get_database().User.find_one({"email": email}, {"_id": 1}):
         raise HTTPException(status_code=404, detail="User not found")
-    for sub in user.get("subjects", []):
-        if sub["slug"] == slug:
-            db.User.update_one(
-                {"email": email}, {"$pull": {"subjects": {"slug": slug}}}
-            )
-            return JSONResponse(
-                status_code=200, content={"message": "Subject deleted successfully"}
-            )
     raise HTTPException(status_code=404, detail="Subject not found")
 
 
 @subjects_router.get("/subjects")
-async def get_subjects(email: str):
-    user = db.User.find_one({"email": email})
-    if not user:
+async def get_subjects(email: str, request: Request):
+    entry = await subject_cache.get(email)
+    if entry is None:
         return JSONResponse(status_code=404, content={"message": "User not found"})
-    subject = user.get("subjects", [])
-    return JSONResponse({"message": "Subjects Fetched", "subjects": subject})
+    return cached_response(request, entry.etag, entry.list_body)
@@ -1,30 +1,160 @@
-from fastapi import APIRouter, Query, HTTPException
+from typing import Any, Dict, List
+from cachetools import TTLCache
+from fastapi import APIRouter, Depends, Query, HTTPException
 from fastapi.responses import JSONResponse
-from googleapiclient.discovery import build
-from utilities.env import Env
+from schemas.schema import VideoBatchRequest
+from utilities.env import get_env
+from utilities.concurrency import run_blocking, gather_bounded, API_POOL, SingleFlight
+from utilities.clients import ClientRegistry, get_clients
+from utilities.lazy import lazy_import
+
+discovery = lazy_import("googleapiclient.discovery")
 
 yt_router = APIRouter()
-env = Env()
+env = get_env()
 
 
-def search(youtube, **kwargs):
-    return youtube.search().list(part="snippet", **kwargs).execute()
+YOUTUBE_CLIENT = "youtube"
 
+# Data API quota cost of one search.list call.
+SEARCH_QUOTA_COST = 100
+MAX_BATCH_QUERIES = 50
 
-@yt_router.get("/youtube-videos")
-async def get_youtube_videos(query: str = Query(...)):
-    youtube = build("youtube", "v3", developerKey=env.YOUTUBE_API_KEY)
-    video_urls = []
 
-    try:
-        response = search(youtube, q=query, type="video", maxResults=10)
+def build_youtube():
+    # The bundled static discovery document is parsed once per process here.
+    return discovery.build("youtube", "v3", developerKey=env.YOUTUBE_API_KEY)
+
+
+def register_clients(clients: ClientRegistry):
+    clients.get(YOUTUBE_CLIENT, build_youtube)
+
+
+def search(youtube, http=None, **kwargs):
+    return youtube.search().list(part="snippet", **kwargs).execute(http=http)
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class SearchCache:
+    """LRU/TTL cache of video searches with single-flight upstream calls.
+
+    Keys are the normalized query plus the search parameters, so "Linear
+    Algebra" and " linear  algebra" share an entry. Concurrent misses for the
+    same key wait on one YouTube call instead of each spending quota.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = env.YOUTUBE_CACHE_SIZE,
+        ttl: int = env.YOUTUBE_CACHE_TTL,
+    ):
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.upstream_calls = 0
+
+    async def _fetch(
+        self, clients: ClientRegistry, key: tuple, params: Dict[str, Any]
+    ) -> List[str]:
+        youtube = await run_blocking(API_POOL, clients.get, YOUTUBE_CLIENT, build_youtube)
+        self.upstream_calls += 1
+        # The shared service object is reused; each pool thread brings its own
+        # keep-alive connection since httplib2 is not thread-safe.
+        response = await run_blocking(
+            API_POOL, lambda: search(youtube, http=clients.http(), **params)
+        )
+        video_urls = [
+            f"{env.YOUTUBE_BASE_URL}={item['id']['videoId']}"
+            for item in response.get("items", [])
+        ]
+        self.memory[key] = video_urls
+        return video_urls
+
+    async def video_urls(
+        self, clients: ClientRegistry, query: str, max_results: int = 10
+    ) -> List[str]:
+        params = {"q": normalize_query(query), "type": "video", "maxResults": max_results}
+        key = tuple(sorted(params.items()))
+        if key in self.memory:
+            self.hits += 1
+            return self.memory[key]
 
-        for item in response.get("items", []):
-            video_id = item["id"]["videoId"]
-            video_url = f"{env.YOUTUBE_BASE_URL}={video_id}"
-            video_urls.append(video_url)
+        self.misses += 1
+        return await self.flights.do(key, lambda: self._fetch(clients, key, params))
 
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        # Hits and coalesced misses are both searches YouTube never saw.
+        saved = self.hits + self.flights.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.flights.coalesced,
+            "upstream_calls": self.upstream_calls,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "quota_saved": saved * SEARCH_QUOTA_COST,
+            "entries": len(self.memory),
+        }
+
+
+search_cache = SearchCache()
+
+
+@yt_router.get("/youtube-videos")
+async def get_youtube_videos(
+    query: str = Query(...), clients: ClientRegistry = Depends(get_clients)
+):
+    try:
+        video_urls = await search_cache.video_urls(clients, query)
         return JSONResponse(content={"video_urls": video_urls})
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@yt_router.post("/youtube-videos/batch")
+async def get_youtube_videos_batch(
+    request: VideoBatchRequest, clients: ClientRegistry = Depends(get_clients)
+):
+    # Topics repeat across a subject ("Intro", " intro"); search each once.
+    unique: Dict[str, str] = {}
+    for query in request.queries:
+        if query.strip():
+            unique.setdefault(normalize_query(query), query)
+    if len(unique) > MAX_BATCH_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_QUERIES} distinct queries per batch.",
+        )
+
+    async def lookup(query: str):
+        try:
+            return await search_cache.video_urls(clients, query, request.max_results)
+        except Exception as e:
+            return e
+
+    results = await gather_bounded(
+        [lambda query=query: lookup(query) for query in unique.values()],
+        env.YOUTUBE_BATCH_CONCURRENCY,
+    )
+    by_key = dict(zip(unique, results))
+
+    videos: Dict[str, List[str]] = {}
+    errors: Dict[str, str] = {}
+    for query in request.queries:
+        result = by_key.get(normalize_query(query))
+        if isinstance(result, Exception):
+            errors[query] = str(result)
+        elif result is not None:
+            videos[query] = result
+
+    return JSONResponse(content={"videos": videos, "errors": errors})
+
+
+@yt_router.get("/cache-stats")
+async def get_cache_stats():
+    return JSONResponse(status_code=200, content=search_cache.stats())
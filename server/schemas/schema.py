@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List
 
 
@@ -11,3 +11,25 @@ class SubjectItem(BaseModel):
 class UserSubjects(BaseModel):
     email: str
     subjects: List[SubjectItem]
+
+
+class Flashcard(BaseModel):
+    question: str
+    answer: str
+
+
+class QuizQuestion(BaseModel):
+    question: str
+    options: List[str]
+    correct_answer: str
+
+
+# Repeats are searched once, so the raw list may run longer than the distinct
+# limit the route enforces, but not without bound.
+MAX_BATCH_RAW_QUERIES = 500
+
+
+class VideoBatchRequest(BaseModel):
+    queries: List[str] = Field(..., max_length=MAX_BATCH_RAW_QUERIES)
+    # The Data API's own range for search.list maxResults.
+    max_results: int = Field(10, ge=1, le=50)
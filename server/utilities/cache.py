@@ -0,0 +1,114 @@
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from cachetools import TTLCache
+from utilities.database import AsyncCollection, get_database
+from utilities.env import get_env
+from utilities.log import get_logger
+
+env = get_env()
+log = get_logger("cache")
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def make_cache_key(
+    namespace: str, payload: Any, prompt_version: str, model_name: str
+) -> str:
+    """Content address for a generation: what was asked, with which prompt and model."""
+    if isinstance(payload, str):
+        payload = normalize_text(payload)
+    body = json.dumps(
+        [namespace, prompt_version, model_name, payload],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """Two-tier cache for LLM output: an in-process LRU/TTL map in front of Mongo.
+
+    Mongo entries expire through a TTL index on `expires_at`, so every worker
+    shares results and a restart does not throw them away.
+    """
+
+    def __init__(
+        self,
+        collection: AsyncCollection,
+        maxsize: int = env.GENERATION_CACHE_SIZE,
+        ttl: int = env.GENERATION_CACHE_TTL,
+    ):
+        self.collection = collection
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = {"memory": 0, "mongo": 0}
+        self.misses = 0
+        self._indexes_ready = False
+
+    async def _ensure_indexes(self):
+        if not self._indexes_ready:
+            await self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self._indexes_ready = True
+
+    async def get(self, key: str) -> Optional[Any]:
+        if key in self.memory:
+            self.hits["memory"] += 1
+            return self.memory[key]
+
+        try:
+            doc = await self.collection.find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}}
+            )
+        except Exception as e:
+            log.warning("generation cache read failed", error=str(e))
+            doc = None
+
+        if doc is None:
+            self.misses += 1
+            return None
+
+        self.hits["mongo"] += 1
+        self.memory[key] = doc["value"]
+        return doc["value"]
+
+    async def set(self, key: str, value: Any):
+        self.memory[key] = value
+        now = datetime.now(timezone.utc)
+        try:
+            await self._ensure_indexes()
+            await self.collection.replace_one(
+                {"_id": key},
+                {
+                    "_id": key,
+                    "value": value,
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl),
+                },
+                upsert=True,
+            )
+        except Exception as e:
+            log.warning("generation cache write failed", error=str(e))
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.hits["memory"] + self.hits["mongo"]
+        lookups = hits + self.misses
+        return {
+            "hits": dict(self.hits),
+            "misses": self.misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+        }
+
+
+_generation_cache: Optional[GenerationCache] = None
+
+
+def get_generation_cache() -> GenerationCache:
+    global _generation_cache
+    if _generation_cache is None:
+        _generation_cache = GenerationCache(get_database().GenerationCache)
+    return _generation_cache
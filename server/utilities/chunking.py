@@ -0,0 +1,129 @@
+import re
+import textwrap
+import time
+from typing import Iterable, Iterator, List, NamedTuple, Tuple
+from utilities.env import get_env
+from utilities.metrics import STAGE_SECONDS
+
+env = get_env()
+
+# Rough English average for both Gemini's and Llama 3's tokenizers; close enough
+# for budgeting without a network-loaded tokenizer on the hot path.
+CHARS_PER_TOKEN = 4
+
+# Input tokens per chunk. Kept well under each context window so the prompt
+# scaffolding and the model's answer (1.5k-2k tokens) still fit.
+MODEL_TOKEN_BUDGETS = {
+    "gemini-pro": 3000,
+    "groq/llama3-70b-8192": 5000,
+}
+DEFAULT_TOKEN_BUDGET = 2000
+
+SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+class TextUnit(NamedTuple):
+    """One structural unit of a document: a PDF page or a PPTX slide."""
+
+    text: str
+    heading: str = ""
+
+
+class Chunker:
+    """Greedy packer of document units into chunks of at most `token_budget`.
+
+    Units are never split unless a single unit exceeds the budget; then it is cut
+    at line, sentence and finally word boundaries, repeating its heading on each
+    piece. With `overlap_tokens`, each chunk starts with the tail of the last.
+    """
+
+    def __init__(self, token_budget: int, overlap_tokens: int = 0):
+        self.token_budget = token_budget
+        self.overlap_tokens = min(overlap_tokens, token_budget // 4)
+        # Budgets are tracked in characters so separators and rounding are exact.
+        self.max_chars = token_budget * CHARS_PER_TOKEN
+        self.overlap_chars = self.overlap_tokens * CHARS_PER_TOKEN
+
+    @classmethod
+    def for_model(cls, model_name: str) -> "Chunker":
+        budget = env.CHUNK_TOKEN_BUDGET or MODEL_TOKEN_BUDGETS.get(
+            model_name, DEFAULT_TOKEN_BUDGET
+        )
+        return cls(budget, env.CHUNK_OVERLAP_TOKENS)
+
+    def _segments(self, text: str, max_chars: int) -> Iterator[str]:
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if len(line) <= max_chars:
+                yield line
+                continue
+            for sentence in re.split(r"(?<=[.!?])\s+", line):
+                if len(sentence) <= max_chars:
+                    yield sentence
+                else:
+                    yield from textwrap.wrap(sentence, width=max_chars)
+
+    def _pieces(self, unit: TextUnit) -> Iterator[str]:
+        text = unit.text.strip()
+        if not text:
+            return
+        if len(text) <= self.max_chars:
+            yield text
+            return
+
+        heading = unit.heading.strip()
+        prefix = f"{heading}\n" if heading else ""
+        room = max(1, self.max_chars - len(prefix))
+        current: List[str] = []
+        size = 0
+        for segment in self._segments(text, room):
+            added = len(segment) + (1 if current else 0)
+            if current and size + added > room:
+                yield prefix + "\n".join(current)
+                current, size, added = [], 0, len(segment)
+            current.append(segment)
+            size += added
+        if current:
+            yield prefix + "\n".join(current)
+
+    def _overlap(self, chunk: str) -> Tuple[List[str], int]:
+        if not self.overlap_chars:
+            return [], 0
+        tail = chunk[-self.overlap_chars :]
+        # Start the carried-over text on a word boundary.
+        space = tail.find(" ")
+        if 0 <= space < len(tail) - 1:
+            tail = tail[space + 1 :]
+        return [tail], len(tail)
+
+    def pack(self, units: Iterable[TextUnit]) -> Iterator[str]:
+        current: List[str] = []
+        size = 0
+        # Only time spent splitting units counts as chunking; `units` may be a
+        # lazy extractor and the consumer runs between yields.
+        elapsed = 0.0
+        for unit in units:
+            started = time.perf_counter()
+            pieces = list(self._pieces(unit))
+            elapsed += time.perf_counter() - started
+            for piece in pieces:
+                added = len(piece) + (len(SEPARATOR) if current else 0)
+                if current and size + added > self.max_chars:
+                    chunk = SEPARATOR.join(current)
+                    yield chunk
+                    current, size = self._overlap(chunk)
+                    added = len(piece) + (len(SEPARATOR) if current else 0)
+                    if size + added > self.max_chars:
+                        # No room for the overlap next to this piece: drop it.
+                        current, size, added = [], 0, len(piece)
+                current.append(piece)
+                size += added
+        if current:
+            yield SEPARATOR.join(current)
+        STAGE_SECONDS.observe(elapsed, stage="chunk")
@@ -0,0 +1,56 @@
+import threading
+from typing import Any, Callable, Dict, TypeVar
+import httplib2
+
+T = TypeVar("T")
+
+
+class ClientRegistry:
+    """Application-lifetime home for SDK clients that are expensive to build.
+
+    Routers register factories under a name; the first `get` builds the client
+    and every later call (from any request or worker thread) reuses it. The
+    app's lifespan hook warms the registry so no request pays the setup cost.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, Any] = {}
+        # Reentrant: a factory may get the clients it is built from.
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    def get(self, name: str, factory: Callable[[], T]) -> T:
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = factory()
+                    self._clients[name] = client
+        return client
+
+    def http(self) -> httplib2.Http:
+        """Keep-alive HTTP connection pool for the calling thread.
+
+        httplib2 objects are not thread-safe, so each pool thread keeps its own
+        and reuses its connections across requests.
+        """
+        if not hasattr(self._local, "http"):
+            self._local.http = httplib2.Http(timeout=30)
+        return self._local.http
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                close = getattr(client, "close", None)
+                if callable(close):
+                    close()
+            self._clients.clear()
+
+
+_registry = ClientRegistry()
+
+
+def get_clients() -> ClientRegistry:
+    """FastAPI dependency (and plain accessor for workers) for the shared registry."""
+    return _registry
@@ -0,0 +1,159 @@
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TypeVar,
+)
+from utilities.env import get_env
+
+T = TypeVar("T")
+env = get_env()
+
+# Outbound API calls (LLM providers, YouTube) get their own pool so a burst of
+# slow generations can never starve Mongo reads.
+DB_POOL = "db"
+API_POOL = "api"
+# Pure-Python work too short to ship to a process (merging and deduplicating
+# chunk results); a small pool bounds how many run at once.
+CPU_POOL = "cpu"
+
+_pool_sizes = {
+    DB_POOL: env.DB_THREADS,
+    API_POOL: env.API_THREADS,
+    CPU_POOL: env.CPU_THREADS,
+}
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+_process_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor(pool: str) -> ThreadPoolExecutor:
+    with _executors_lock:
+        if pool not in _executors:
+            _executors[pool] = ThreadPoolExecutor(
+                max_workers=_pool_sizes[pool], thread_name_prefix=f"{pool}-pool"
+            )
+        return _executors[pool]
+
+
+async def run_blocking(pool: str, fn: Callable[..., T], *args, **kwargs) -> T:
+    """Run a blocking call on the named thread pool without blocking the event loop.
+
+    Like `asyncio.to_thread`, the caller's context variables (e.g. the request
+    priority) are visible to `fn`.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_executor(pool), functools.partial(context.run, fn, *args, **kwargs)
+    )
+
+
+def get_process_executor() -> ProcessPoolExecutor:
+    """Process pool for CPU-bound work such as document parsing.
+
+    spawn, not fork: children must not inherit the server's threads, event loop
+    or Mongo sockets. Workers start on first use and are reused afterwards.
+    """
+    global _process_executor
+    with _executors_lock:
+        if _process_executor is None:
+            _process_executor = ProcessPoolExecutor(
+                max_workers=env.PARSE_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _process_executor
+
+
+def shutdown_executors():
+    global _process_executor
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
+        if _process_executor is not None:
+            _process_executor.shutdown(wait=False, cancel_futures=True)
+            _process_executor = None
+
+
+async def gather_bounded(
+    factories: Iterable[Callable[[], Awaitable[T]]], limit: int
+) -> List[T]:
+    """Run coroutine factories with at most `limit` in flight, preserving order."""
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(factory: Callable[[], Awaitable[T]]) -> T:
+        async with semaphore:
+            return await factory()
+
+    return await asyncio.gather(*(run(factory) for factory in factories))
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-flight task.
+
+    The first caller for a key starts the work; callers arriving while it runs
+    await the same result (or exception) instead of repeating the call. A
+    cancelled follower does not cancel the shared task.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+
+async def iterate_in_thread(iterator: Iterator[T]) -> AsyncIterator[T]:
+    """Drive a blocking iterator from async code, one `next()` per worker-thread hop."""
+    sentinel = object()
+    while True:
+        item = await asyncio.to_thread(next, iterator, sentinel)
+        if item is sentinel:
+            return
+        yield item
+
+
+async def retry_with_backoff(
+    fn: Callable[[], Awaitable[T]],
+    should_retry: Callable[[Exception], bool],
+    retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 30.0,
+) -> T:
+    """Await `fn()`, retrying with exponential backoff and full jitter on retryable errors.
+
+    The backoff sleeps on the event loop, so a retrying call holds no pool
+    thread between attempts.
+    """
+    attempt = 0
+    while True:
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt >= retries or not should_retry(e):
+                raise
+            delay = min(max_delay, base_delay * (2**attempt))
+            await asyncio.sleep(random.uniform(0, delay))
+            attempt += 1
@@ -1,15 +1,246 @@
-from pymongo import MongoClient
-from utilities.env import Env
+import importlib.util
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from pymongo import MongoClient, monitoring
+from pymongo.collection import Collection
+from utilities.env import get_env
+from utilities.concurrency import run_blocking, DB_POOL
+from utilities.metrics import Histogram, register_collector, timed
 import certifi
 
-env = Env()
+env = get_env()
+
+# Compressor name -> module pymongo needs for it (zlib ships with Python).
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+MONGO_CHECKOUT_SECONDS = Histogram(
+    "equilearn_mongo_pool_checkout_seconds",
+    "Time to get a connection from the Mongo pool.",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+
+
+class AsyncCollection:
+    """Awaitable facade over a pymongo collection.
+
+    Every call runs on the dedicated database thread pool, so route handlers can
+    `await db.User.find_one(...)` without stalling the event loop.
+    """
+
+    def __init__(self, collection: Collection):
+        self.collection = collection
+
+    async def _run(self, fn, *args, **kwargs):
+        def call():
+            # Timed on the pool thread: round trip only, not queueing for a thread.
+            with timed("mongo"):
+                return fn(*args, **kwargs)
+
+        return await run_blocking(DB_POOL, call)
+
+    async def find_one(self, *args, **kwargs):
+        return await self._run(self.collection.find_one, *args, **kwargs)
+
+    async def find(self, *args, limit: int = 0, **kwargs) -> list:
+        return await self._run(
+            lambda: list(self.collection.find(*args, limit=limit, **kwargs))
+        )
+
+    async def aggregate(self, *args, **kwargs) -> list:
+        return await self._run(
+            lambda: list(self.collection.aggregate(*args, **kwargs))
+        )
+
+    async def insert_one(self, *args, **kwargs):
+        return await self._run(self.collection.insert_one, *args, **kwargs)
+
+    async def insert_many(self, *args, **kwargs):
+        return await self._run(self.collection.insert_many, *args, **kwargs)
+
+    async def replace_one(self, *args, **kwargs):
+        return await self._run(self.collection.replace_one, *args, **kwargs)
+
+    async def update_one(self, *args, **kwargs):
+        return await self._run(self.collection.update_one, *args, **kwargs)
+
+    async def find_one_and_update(self, *args, **kwargs):
+        return await self._run(self.collection.find_one_and_update, *args, **kwargs)
+
+    async def delete_one(self, *args, **kwargs):
+        return await self._run(self.collection.delete_one, *args, **kwargs)
+
+    async def delete_many(self, *args, **kwargs):
+        return await self._run(self.collection.delete_many, *args, **kwargs)
+
+    async def create_index(self, *args, **kwargs):
+        return await self._run(self.collection.create_index, *args, **kwargs)
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Connection pool utilization, fed by pymongo's pool events.
+
+    Listeners run inline on the thread doing the checkout, so each event is a
+    counter update under a lock and nothing more.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.in_use = 0
+        self.checkouts = 0
+        self.checkout_failures: Counter = Counter()
+        self.cleared = 0
+
+    def _add(self, field: str, amount: int = 1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def connection_created(self, event):
+        self._add("open")
+
+    def connection_closed(self, event):
+        self._add("open", -1)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+        if event.duration is not None:
+            MONGO_CHECKOUT_SECONDS.observe(event.duration)
+
+    def connection_checked_in(self, event):
+        self._add("in_use", -1)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures[str(event.reason)] += 1
+
+    def pool_cleared(self, event):
+        self._add("cleared")
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_size": env.MONGO_MAX_POOL_SIZE,
+                "open": self.open,
+                "in_use": self.in_use,
+                "utilization": self.in_use / env.MONGO_MAX_POOL_SIZE
+                if env.MONGO_MAX_POOL_SIZE
+                else 0.0,
+                "checkouts": self.checkouts,
+                "checkout_failures": dict(self.checkout_failures),
+                "cleared": self.cleared,
+            }
+
+
+pool_stats = PoolStats()
+
+
+def available_compressors(names: List[str]) -> List[str]:
+    return [
+        name
+        for name in names
+        if name in COMPRESSOR_MODULES
+        and importlib.util.find_spec(COMPRESSOR_MODULES[name]) is not None
+    ]
+
+
+def client_options() -> Dict[str, Any]:
+    """MongoClient keyword options from the environment; they override the URI."""
+    options = {
+        "tlsCAFile": certifi.where(),
+        "maxPoolSize": env.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": env.MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": env.MONGO_MAX_IDLE_TIME_MS,
+        "connectTimeoutMS": env.MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": env.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": env.MONGO_SOCKET_TIMEOUT_MS or None,
+        "waitQueueTimeoutMS": env.MONGO_WAIT_QUEUE_TIMEOUT_MS or None,
+        "readPreference": env.MONGO_READ_PREFERENCE,
+        "event_listeners": [pool_stats],
+    }
+    compressors = available_compressors(env.MONGO_COMPRESSORS)
+    if compressors:
+        options["compressors"] = compressors
+    return options
 
 
 class Database:
     def __init__(self):
-        self.client = MongoClient(env.DB_URI, tlsCAFile=certifi.where())
+        self.client = MongoClient(env.DB_URI, **client_options())
         self.db = self.client[env.DB_NAME]
-        self.User = self.db.User
+        self.User = AsyncCollection(self.db.User)
+        self.GenerationCache = AsyncCollection(self.db.GenerationCache)
+        self.Jobs = AsyncCollection(self.db.Jobs)
+        self.StudyMaterials = AsyncCollection(self.db.StudyMaterials)
+        self.StudyMaterialBatches = AsyncCollection(self.db.StudyMaterialBatches)
 
-    def __close__(self):
+    def close(self):
         self.client.close()
+
+
+_database: Optional[Database] = None
+_database_lock = threading.Lock()
+
+
+def get_database() -> Database:
+    """The process's one Database, and with it one client and connection pool.
+
+    Built on first use so each spawned worker process opens its own.
+    """
+    global _database
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                _database = Database()
+    return _database
+
+
+def close_database():
+    global _database
+    with _database_lock:
+        if _database is not None:
+            _database.close()
+            _database = None
+
+
+def collect_pool_stats():
+    stats = pool_stats.stats()
+    for field, kind, help in (
+        ("max_size", "gauge", "Configured maximum connections per process."),
+        ("open", "gauge", "Open pooled connections."),
+        ("in_use", "gauge", "Connections checked out of the pool."),
+        ("utilization", "gauge", "Checked out connections over the maximum."),
+    ):
+        yield (f"equilearn_mongo_pool_{field}", kind, help, {(): stats[field]})
+    yield (
+        "equilearn_mongo_pool_checkout_failures_total",
+        "counter",
+        "Failed connection checkouts by reason.",
+        {(("reason", reason),): n for reason, n in stats["checkout_failures"].items()},
+    )
+    yield (
+        "equilearn_mongo_pool_cleared_total",
+        "counter",
+        "Times the pool was cleared after a network error or failover.",
+        {(): stats["cleared"]},
+    )
+
+
+register_collector(collect_pool_stats)
@@ -0,0 +1,114 @@
+import re
+import zlib
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+import numpy as np
+
+SHINGLE_SIZE = 5
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+# Items on one subject share most of their vocabulary, so a band bucket can
+# grow with the pass; only its most recent entries are compared.
+MAX_CANDIDATES_PER_BAND = 8
+_PRIME = (1 << 31) - 1
+
+# Fixed seed: signatures only have to agree within one deduplication pass, but
+# a stable seed keeps results reproducible across runs.
+_rng = np.random.default_rng(20241230)
+_A = _rng.integers(1, _PRIME, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, size=NUM_PERM, dtype=np.uint64)
+
+
+def normalize(text: str) -> str:
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+def _shingles(text: str) -> frozenset:
+    if len(text) <= SHINGLE_SIZE:
+        return frozenset([text])
+    return frozenset(
+        text[i : i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)
+    )
+
+
+def _signature(shingles: frozenset) -> np.ndarray:
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode("utf-8")) for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+
+
+class Deduplicator:
+    """Incremental exact + near-duplicate filter for generated study items.
+
+    Exact repeats (after normalization) are caught by a hash set. Near repeats
+    are found with MinHash LSH: items sharing any band of their signature become
+    candidates, and a candidate only counts as a duplicate if the real Jaccard
+    similarity of their character shingles reaches `threshold`. Each `add`
+    compares against at most BANDS x MAX_CANDIDATES_PER_BAND earlier items, so a
+    pass over n items stays linear.
+    """
+
+    def __init__(self, key: Callable[[Any], str], threshold: float = 0.8):
+        self.key = key
+        self.threshold = threshold
+        self.merged = 0
+        self._exact = set()
+        self._shingle_sets: List[frozenset] = []
+        self._numbers: List[Tuple[str, ...]] = []
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(BANDS)]
+
+    def add(self, item: Any) -> bool:
+        """Register `item`; returns False (and counts a merge) if it is a duplicate."""
+        text = normalize(str(self.key(item) or ""))
+        if text in self._exact:
+            self.merged += 1
+            return False
+
+        shingles = _shingles(text)
+        # "Step 2 of ..." and "Step 3 of ..." differ by one shingle or two but are
+        # different questions, so numbers must match for a near-duplicate.
+        numbers = tuple(re.findall(r"\d+", text))
+        signature = _signature(shingles)
+        bands = [signature[b * ROWS : (b + 1) * ROWS].tobytes() for b in range(BANDS)]
+
+        candidates = set()
+        for bucket, band in zip(self._buckets, bands):
+            candidates.update(bucket.get(band, ())[-MAX_CANDIDATES_PER_BAND:])
+        for index in candidates:
+            if self._numbers[index] != numbers:
+                continue
+            other = self._shingle_sets[index]
+            # Jaccard is at most the ratio of the sizes; skip the intersection
+            # when that alone rules a match out.
+            smaller, larger = sorted((len(shingles), len(other)))
+            if smaller < self.threshold * larger:
+                continue
+            common = len(shingles & other)
+            if common / (smaller + larger - common) >= self.threshold:
+                self.merged += 1
+                return False
+
+        index = len(self._shingle_sets)
+        self._exact.add(text)
+        self._shingle_sets.append(shingles)
+        self._numbers.append(numbers)
+        for bucket, band in zip(self._buckets, bands):
+            bucket.setdefault(band, []).append(index)
+        return True
+
+
+def question_key(item: Any) -> str:
+    return item.get("question", "") if isinstance(item, dict) else str(item)
+
+
+def deduplicate(
+    items: Iterable[Any], key: Callable[[Any], str] = question_key
+) -> Tuple[List[Any], int]:
+    """Drop exact and near-duplicate items, keeping first occurrences in order."""
+    deduplicator = Deduplicator(key)
+    kept = [item for item in items if deduplicator.add(item)]
+    return kept, deduplicator.merged
@@ -0,0 +1,124 @@
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, Iterator, List
+from utilities.chunking import TextUnit
+from utilities.concurrency import get_process_executor
+from utilities.env import get_env
+from utilities.lazy import lazy_import
+from utilities.log import get_logger
+from utilities.metrics import timed
+
+PyPDF2 = lazy_import("PyPDF2")
+pptx = lazy_import("pptx")
+
+env = get_env()
+log = get_logger("documents")
+
+
+# Everything here runs in parse worker processes as well as the server, so it
+# must stay importable without the web or LLM stacks.
+
+
+def _pdf_units(path: str, start: int, stop: int) -> List[TextUnit]:
+    reader = PyPDF2.PdfReader(path)
+    return [
+        TextUnit(reader.pages[index].extract_text() or "")
+        for index in range(start, stop)
+    ]
+
+
+def _pptx_units(path: str, start: int, stop: int) -> List[TextUnit]:
+    slides = pptx.Presentation(path).slides
+    units = []
+    for index in range(start, stop):
+        slide = slides[index]
+        title = slide.shapes.title
+        units.append(
+            TextUnit(
+                "".join(
+                    shape.text + "\n"
+                    for shape in slide.shapes
+                    if hasattr(shape, "text")
+                ),
+                heading=title.text if title is not None else "",
+            )
+        )
+    return units
+
+
+def _pdf_count(path: str) -> int:
+    return len(PyPDF2.PdfReader(path).pages)
+
+
+def _pptx_count(path: str) -> int:
+    return len(pptx.Presentation(path).slides)
+
+
+EXTRACTORS: Dict[str, Callable[[str, int, int], List[TextUnit]]] = {
+    "pdf": _pdf_units,
+    "pptx": _pptx_units,
+}
+COUNTERS: Dict[str, Callable[[str], int]] = {"pdf": _pdf_count, "pptx": _pptx_count}
+
+
+def extract_range(path: str, extension: str, start: int, stop: int) -> List[TextUnit]:
+    """Pages (or slides) `[start, stop)` of the document at `path`."""
+    return EXTRACTORS[extension](path, start, stop)
+
+
+def iter_document_units(
+    path: str, extension: str, pages_per_task: int = env.PARSE_PAGES_PER_TASK
+) -> Iterator[TextUnit]:
+    """Yield a document's pages or slides in order, parsed across processes.
+
+    Text extraction is pure Python and CPU-bound, so ranges of
+    `pages_per_task` units are parsed in the process pool, about
+    PARSE_PROCESSES ranges at a time, and yielded back in document order as
+    each range completes. Documents that fit in one range are parsed inline.
+    This blocks; drive it from a worker thread.
+    """
+    with timed("extract"):
+        total = COUNTERS[extension](path)
+    log.info("parsing document", extension=extension, units=total)
+    if total <= pages_per_task:
+        with timed("extract"):
+            units = extract_range(path, extension, 0, total)
+        yield from units
+        return
+
+    executor = get_process_executor()
+    starts = iter(range(0, total, pages_per_task))
+    # At most one range per parse process is in flight (or parsed and waiting),
+    # and a range's text is dropped once yielded, so memory stays bounded
+    # whatever the document's length.
+    pending: Deque[Future] = deque()
+
+    def submit_next():
+        start = next(starts, None)
+        if start is not None:
+            pending.append(
+                executor.submit(
+                    extract_range,
+                    path,
+                    extension,
+                    start,
+                    min(start + pages_per_task, total),
+                )
+            )
+
+    for _ in range(env.PARSE_PROCESSES):
+        submit_next()
+    try:
+        while pending:
+            future = pending.popleft()
+            # Only the wait for a range counts; the consumer's time between
+            # ranges is not extraction.
+            with timed("extract"):
+                units = future.result()
+            del future
+            submit_next()
+            yield from units
+            del units
+    finally:
+        for future in pending:
+            future.cancel()
@@ -1,5 +1,7 @@
 from dotenv import load_dotenv
+from typing import Optional
 import os
+import tempfile
 
 
 class Env:
@@ -10,3 +12,101 @@ class Env:
         self.YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
         self.YOUTUBE_BASE_URL = os.getenv("YOUTUBE_BASE_URL")
         self.GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+        self.GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+        self.LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+        self.LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+        self.LLM_COMBINED_PROMPT = os.getenv("LLM_COMBINED_PROMPT", "true") == "true"
+        self.GEMINI_RPM = int(os.getenv("GEMINI_RPM", "60"))
+        self.GEMINI_TPM = int(os.getenv("GEMINI_TPM", "120000"))
+        self.GROQ_RPM = int(os.getenv("GROQ_RPM", "30"))
+        self.GROQ_TPM = int(os.getenv("GROQ_TPM", "6000"))
+        self.CHUNK_TOKEN_BUDGET = int(os.getenv("CHUNK_TOKEN_BUDGET", "0"))
+        self.CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "0"))
+        self.LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+        self.LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+        self.DB_THREADS = int(os.getenv("DB_THREADS", "16"))
+        self.API_THREADS = int(os.getenv("API_THREADS", "32"))
+        self.CPU_THREADS = int(os.getenv("CPU_THREADS", "2"))
+        self.PARSE_PROCESSES = int(os.getenv("PARSE_PROCESSES", "0")) or (
+            os.cpu_count() or 1
+        )
+        self.PARSE_PAGES_PER_TASK = int(os.getenv("PARSE_PAGES_PER_TASK", "25"))
+        self.GENERATION_CACHE_SIZE = int(os.getenv("GENERATION_CACHE_SIZE", "1024"))
+        self.GENERATION_CACHE_TTL = int(os.getenv("GENERATION_CACHE_TTL", "604800"))
+        self.JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+        self.JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+        self.JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", "600"))
+        # Must stay well under JOB_STALE_AFTER.
+        self.JOB_HEARTBEAT_INTERVAL = float(
+            os.getenv("JOB_HEARTBEAT_INTERVAL", str(self.JOB_STALE_AFTER / 4))
+        )
+        self.YOUTUBE_CACHE_SIZE = int(os.getenv("YOUTUBE_CACHE_SIZE", "512"))
+        self.YOUTUBE_CACHE_TTL = int(os.getenv("YOUTUBE_CACHE_TTL", "3600"))
+        self.YOUTUBE_BATCH_CONCURRENCY = int(
+            os.getenv("YOUTUBE_BATCH_CONCURRENCY", "8")
+        )
+        # Subject reads served from memory. Entries older than FRESH seconds
+        # are checked against the user's subjectsVersion, so other processes'
+        # writes show up within FRESH; edits by the frontend's Prisma client,
+        # which do not bump it, show up within the TTL.
+        self.SUBJECT_CACHE_SIZE = int(os.getenv("SUBJECT_CACHE_SIZE", "4096"))
+        self.SUBJECT_CACHE_TTL = int(os.getenv("SUBJECT_CACHE_TTL", "10"))
+        self.SUBJECT_CACHE_FRESH = float(os.getenv("SUBJECT_CACHE_FRESH", "1"))
+        # Stored notes are split into sections of about this many characters
+        # (one page each); sections from this size up are zlib-compressed.
+        self.MATERIALS_SECTION_CHARS = int(
+            os.getenv("MATERIALS_SECTION_CHARS", "4000")
+        )
+        self.MATERIALS_COMPRESS_MIN_BYTES = int(
+            os.getenv("MATERIALS_COMPRESS_MIN_BYTES", "1024")
+        )
+        # Router groups this worker serves: videos, subjects, cards, generator,
+        # materials.
+        self.ROUTE_GROUPS = [
+            group.strip()
+            for group in os.getenv(
+                "ROUTE_GROUPS", "videos,subjects,cards,generator,materials"
+            ).split(",")
+            if group.strip()
+        ]
+        # When SDK clients are built: "startup", "background" or "lazy".
+        self.CLIENT_WARMUP = os.getenv("CLIENT_WARMUP", "background")
+        self.JOB_UPLOAD_DIR = os.getenv(
+            "JOB_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "equilearn-jobs")
+        )
+        # One client (and pool) per process: total connections to the cluster
+        # are MONGO_MAX_POOL_SIZE x processes. A pool larger than DB_THREADS
+        # is never used, as only those threads talk to Mongo.
+        self.MONGO_MAX_POOL_SIZE = int(
+            os.getenv("MONGO_MAX_POOL_SIZE", str(self.DB_THREADS))
+        )
+        self.MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+        self.MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+        self.MONGO_CONNECT_TIMEOUT_MS = int(
+            os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")
+        )
+        self.MONGO_SERVER_SELECTION_TIMEOUT_MS = int(
+            os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")
+        )
+        self.MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000"))
+        self.MONGO_WAIT_QUEUE_TIMEOUT_MS = int(
+            os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000")
+        )
+        self.MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+        # In order of preference; ones whose library is missing are skipped.
+        self.MONGO_COMPRESSORS = [
+            name.strip()
+            for name in os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib").split(",")
+            if name.strip()
+        ]
+
+
+_env: Optional[Env] = None
+
+
+def get_env() -> Env:
+    """Process-wide settings; `.env` and the environment are read once."""
+    global _env
+    if _env is None:
+        _env = Env()
+    return _env
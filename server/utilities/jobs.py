@@ -0,0 +1,234 @@
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+from pymongo import ReturnDocument
+from utilities.database import AsyncCollection, get_database
+from utilities.env import get_env
+from utilities.log import get_logger
+
+env = get_env()
+log = get_logger("jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+JobHandler = Callable[["JobQueue", Dict[str, Any]], Awaitable[None]]
+
+
+class JobLost(Exception):
+    """The job went stale and was reclaimed by another worker."""
+
+
+class JobQueue:
+    """Mongo-backed job queue.
+
+    Jobs are claimed with an atomic find_one_and_update, so any number of
+    in-process workers and separate worker processes can share one collection.
+    A running job whose heartbeat (`updated_at`) goes stale is handed out again;
+    every write after the claim is conditional on still holding it.
+    """
+
+    def __init__(
+        self,
+        collection: AsyncCollection,
+        stale_after: int = env.JOB_STALE_AFTER,
+    ):
+        self.collection = collection
+        self.stale_after = stale_after
+        self._indexes_ready = False
+
+    async def _ensure_indexes(self):
+        if not self._indexes_ready:
+            await self.collection.create_index([("status", 1), ("created_at", 1)])
+            self._indexes_ready = True
+
+    async def enqueue(self, kind: str, payload: Dict[str, Any]) -> str:
+        await self._ensure_indexes()
+        now = datetime.now(timezone.utc)
+        job_id = uuid.uuid4().hex
+        await self.collection.insert_one(
+            {
+                "_id": job_id,
+                "kind": kind,
+                "payload": payload,
+                "status": QUEUED,
+                "total": None,
+                "results": {},
+                "error": None,
+                "worker": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+        return job_id
+
+    async def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+        stale = now - timedelta(seconds=self.stale_after)
+        return await self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": QUEUED},
+                    {"status": RUNNING, "updated_at": {"$lt": stale}},
+                ]
+            },
+            {"$set": {"status": RUNNING, "worker": worker_id, "updated_at": now}},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _update_owned(
+        self, job_id: str, worker_id: str, fields: Dict[str, Any]
+    ) -> bool:
+        """Apply `fields` only while `worker_id` still holds the job.
+
+        Once a stale job is reclaimed, the previous holder's writes match
+        nothing, so two workers never both record results or a final status.
+        """
+        result = await self.collection.update_one(
+            {"_id": job_id, "worker": worker_id},
+            {"$set": {**fields, "updated_at": datetime.now(timezone.utc)}},
+        )
+        return result.matched_count == 1
+
+    async def _require_owned(
+        self, job_id: str, worker_id: str, fields: Dict[str, Any]
+    ):
+        if not await self._update_owned(job_id, worker_id, fields):
+            raise JobLost(job_id)
+
+    async def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Keep a running job from going stale; False once another worker has it."""
+        return await self._update_owned(job_id, worker_id, {})
+
+    async def owns(self, job_id: str, worker_id: str) -> bool:
+        job = await self.collection.find_one(
+            {"_id": job_id, "worker": worker_id}, {"_id": 1}
+        )
+        return job is not None
+
+    async def set_total(self, job_id: str, worker_id: str, total: int):
+        await self._require_owned(job_id, worker_id, {"total": total})
+
+    async def record_result(self, job_id: str, worker_id: str, index: int, result: Any):
+        """Persist one unit of partial output.
+
+        Results are keyed by index, so a reclaimed job that redoes a unit simply
+        overwrites it and progress (`len(results)`) never double counts.
+        """
+        await self._require_owned(job_id, worker_id, {f"results.{index}": result})
+
+    async def set_result(self, job_id: str, worker_id: str, result: Any):
+        """Store the job's final output, computed once instead of per poll."""
+        await self._require_owned(job_id, worker_id, {"result": result})
+
+    async def complete(self, job_id: str, worker_id: str) -> bool:
+        return await self._update_owned(job_id, worker_id, {"status": COMPLETED})
+
+    async def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        return await self._update_owned(
+            job_id, worker_id, {"status": FAILED, "error": error}
+        )
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"_id": job_id})
+
+
+async def keep_alive(
+    queue: JobQueue,
+    job_id: str,
+    worker_id: str,
+    handler: "asyncio.Task[None]",
+    interval: float,
+) -> bool:
+    """Refresh the job's heartbeat while `handler` runs.
+
+    A slow split or a long wait in the bulk rate-limiter queue records no
+    results, so progress alone cannot keep a job from going stale. If another
+    worker has reclaimed it, `handler` is cancelled and True returned.
+    """
+    while not handler.done():
+        await asyncio.sleep(interval)
+        try:
+            owned = await queue.heartbeat(job_id, worker_id)
+        except Exception as e:
+            log.warning("job heartbeat failed", job_id=job_id, error=str(e))
+            continue
+        if not owned:
+            handler.cancel()
+            return True
+    return False
+
+
+async def run_worker(
+    queue: JobQueue,
+    handlers: Dict[str, JobHandler],
+    stop: asyncio.Event,
+    poll_interval: float = env.JOB_POLL_INTERVAL,
+    heartbeat_interval: float = env.JOB_HEARTBEAT_INTERVAL,
+):
+    """Claim and run jobs until `stop` is set, sleeping while the queue is empty."""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    while not stop.is_set():
+        try:
+            job = await queue.claim(worker_id)
+        except Exception as e:
+            log.warning("job claim failed", worker=worker_id, error=str(e))
+            job = None
+
+        if job is None:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        log.info("job claimed", job_id=job["_id"], kind=job["kind"], worker=worker_id)
+        run = handlers.get(job["kind"])
+        if run is None:
+            # Retrying cannot help; fail it rather than let it go stale and
+            # trip every worker that reclaims it.
+            log.error("unknown job kind", job_id=job["_id"], kind=job["kind"])
+            try:
+                await queue.fail(job["_id"], worker_id, "unknown job kind")
+            except Exception as e:
+                log.warning("could not mark job failed", job_id=job["_id"], error=str(e))
+            continue
+
+        handler = asyncio.create_task(run(queue, job))
+        heartbeat = asyncio.create_task(
+            keep_alive(queue, job["_id"], worker_id, handler, heartbeat_interval)
+        )
+        try:
+            await handler
+            if await queue.complete(job["_id"], worker_id):
+                log.info("job completed", job_id=job["_id"], kind=job["kind"])
+            else:
+                log.warning("job lost before completion", job_id=job["_id"])
+        except asyncio.CancelledError:
+            lost = heartbeat.done() and not heartbeat.cancelled() and heartbeat.result()
+            if not lost:
+                raise
+            log.warning("job lost to another worker", job_id=job["_id"], worker=worker_id)
+        except JobLost:
+            log.warning("job lost to another worker", job_id=job["_id"], worker=worker_id)
+        except Exception as e:
+            log.error("job failed", job_id=job["_id"], kind=job["kind"], error=str(e))
+            await queue.fail(job["_id"], worker_id, str(e))
+        finally:
+            heartbeat.cancel()
+
+
+_job_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue(get_database().Jobs)
+    return _job_queue
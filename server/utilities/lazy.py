@@ -0,0 +1,54 @@
+import importlib
+import threading
+import time
+from types import ModuleType
+from typing import Dict
+from utilities.log import get_logger
+
+log = get_logger("lazy")
+
+# Seconds each lazily imported module took to load, in load order.
+import_seconds: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access.
+
+    The heavy SDKs (crewAI, litellm, Gemini, the Google API client, the
+    document parsers) take seconds to import between them; deferring them keeps
+    a worker's boot time down to what it actually serves. Attribute writes go
+    to the real module too, so patching `lazy.attr` still works.
+    """
+
+    def __init__(self, name: str):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+
+    def _load(self) -> ModuleType:
+        module = self._module
+        if module is None:
+            started = time.perf_counter()
+            module = importlib.import_module(self._name)
+            elapsed = time.perf_counter() - started
+            with _lock:
+                if self._module is None:
+                    object.__setattr__(self, "_module", module)
+                    import_seconds.setdefault(self._name, elapsed)
+                    log.info("lazy import", module=self._name, seconds=elapsed)
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """`genai = lazy_import("google.generativeai")` instead of `import ... as genai`."""
+    return LazyModule(name)
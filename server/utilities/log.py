@@ -0,0 +1,89 @@
+import json
+import logging
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Any
+from utilities.env import get_env
+
+env = get_env()
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, event and fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+            **getattr(record, "fields", {}),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def configure_logging():
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JsonFormatter())
+        root = logging.getLogger("equilearn")
+        root.addHandler(handler)
+        root.setLevel(env.LOG_LEVEL)
+        root.propagate = False
+        _configured = True
+
+
+class Logger:
+    """Leveled, structured logger with per-call sampling.
+
+    `sample` keeps roughly that fraction of a call site's records, for events
+    that fire per chunk or per request. Disabled levels return before any
+    formatting, so hot paths can log freely.
+    """
+
+    def __init__(self, name: str):
+        configure_logging()
+        self._logger = logging.getLogger(f"equilearn.{name}")
+
+    def log(self, level: int, event: str, sample: float = 1.0, **fields: Any):
+        if not self._logger.isEnabledFor(level):
+            return
+        if sample < 1.0 and random.random() >= sample:
+            return
+        self._logger.log(
+            level,
+            event,
+            exc_info=fields.pop("exc_info", None),
+            extra={"fields": fields},
+        )
+
+    def debug(self, event: str, **fields: Any):
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields: Any):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields: Any):
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event: str, **fields: Any):
+        self.log(logging.ERROR, event, **fields)
+
+
+def get_logger(name: str) -> Logger:
+    return Logger(name)
+
+
+def preview(text: str, limit: int = 200) -> str:
+    """Head of a prompt or response, for debug records that must stay small."""
+    return text if len(text) <= limit else text[:limit] + "..."
@@ -0,0 +1,326 @@
+import asyncio
+import uuid
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from slugify import slugify
+from utilities.database import AsyncCollection, get_database
+from utilities.env import get_env
+from utilities.log import get_logger
+
+env = get_env()
+log = get_logger("materials")
+
+# Lists of items (one document per card or question) and markdown text (one
+# document per section).
+ITEM_KINDS = ("flashcards", "quiz")
+TEXT_KINDS = ("notes", "content")
+KINDS = ITEM_KINDS + TEXT_KINDS
+
+
+class Lesson(NamedTuple):
+    """Owner of a set of materials; subject and lesson are stored as slugs.
+
+    `subject` is the subject's stored slug. Slugs are allocated uniquely per
+    user ("Math!" may be `math-1` next to "Math"), so they cannot be derived
+    from the name; a Lesson built from a name alone has `subject` None until
+    `resolve_subject` looks it up.
+    """
+
+    email: str
+    subject: Optional[str]
+    lesson: str
+    subject_name: str
+    lesson_name: str
+
+    @classmethod
+    def of(
+        cls,
+        email: Optional[str],
+        subject: Optional[str],
+        lesson: Optional[str],
+        subject_slug: Optional[str] = None,
+    ) -> Optional["Lesson"]:
+        """A Lesson when email, subject (name or slug) and lesson are given, None when none are."""
+        given = [value for value in (email, subject or subject_slug, lesson) if value]
+        if not given:
+            return None
+        if len(given) < 3:
+            raise ValueError("email, subject and lesson are needed to save materials")
+        return cls(
+            email, subject_slug or None, slugify(lesson), subject or subject_slug, lesson
+        )
+
+    def filter(self) -> Dict[str, str]:
+        return {"email": self.email, "subject": self.subject, "lesson": self.lesson}
+
+
+async def resolve_subject(lesson: Lesson) -> Lesson:
+    """`lesson` keyed by its subject's stored slug and carrying the stored name.
+
+    The user's subject is matched by slug when one was given, else by name
+    (case-insensitively, as subject creation compares names).
+    """
+    user = await get_database().User.find_one(
+        {"email": lesson.email}, {"_id": 0, "subjects.name": 1, "subjects.slug": 1}
+    )
+    for subject in (user or {}).get("subjects", []):
+        if lesson.subject is not None:
+            found = subject.get("slug") == lesson.subject
+        else:
+            found = subject.get("name", "").lower() == lesson.subject_name.lower()
+        if found:
+            return lesson._replace(subject=subject["slug"], subject_name=subject["name"])
+    raise ValueError(
+        f"User has no subject {lesson.subject or lesson.subject_name!r}"
+    )
+
+
+def split_sections(text: str, limit: int) -> Iterator[str]:
+    """Cut text at line boundaries into pieces of about `limit` characters.
+
+    A markdown heading past half a section starts a new one, so sections tend
+    to follow the document's own structure.
+    """
+    section: List[str] = []
+    size = 0
+    for line in text.splitlines(keepends=True):
+        if section and (
+            size + len(line) > limit or (line.startswith("#") and size > limit // 2)
+        ):
+            yield "".join(section)
+            section, size = [], 0
+        section.append(line)
+        size += len(line)
+    if section:
+        yield "".join(section)
+
+
+def encode_text(text: str) -> Dict[str, Any]:
+    data = text.encode("utf-8")
+    if len(data) >= env.MATERIALS_COMPRESS_MIN_BYTES:
+        return {"text_z": zlib.compress(data)}
+    return {"text": text}
+
+
+def decode_text(document: Dict[str, Any]) -> str:
+    if "text_z" in document:
+        return zlib.decompress(document["text_z"]).decode("utf-8")
+    return document["text"]
+
+
+class MaterialStore:
+    """Generated study materials, persisted per user, subject and lesson.
+
+    Saving a kind for a lesson replaces what was stored for it before. Each
+    save writes a new batch; `batches` holds one pointer per (lesson, kind) to
+    the batch readers are served. The new batch is inserted, the pointer
+    flipped to it, and only then the batch it replaced deleted, so readers see
+    either the old materials or the new ones, never both and never none.
+    Pages are read in `_id` order from an index on (email, subject, lesson,
+    kind, batch, _id); the cursor is the last `_id` served.
+    """
+
+    def __init__(self, collection: AsyncCollection, batches: AsyncCollection):
+        self.collection = collection
+        self.batches = batches
+        self._indexes_ready = False
+
+    async def _ensure_indexes(self):
+        if not self._indexes_ready:
+            await self.collection.create_index(
+                [
+                    ("email", 1),
+                    ("subject", 1),
+                    ("lesson", 1),
+                    ("kind", 1),
+                    ("batch", 1),
+                    ("_id", 1),
+                ],
+                name="lesson_kind_batch_id",
+            )
+            await self.batches.create_index(
+                [("email", 1), ("subject", 1), ("lesson", 1), ("kind", 1)],
+                name="lesson_kind",
+                unique=True,
+            )
+            self._indexes_ready = True
+
+    async def _current_batch(
+        self, email: str, subject: str, lesson: str, kind: str
+    ) -> Optional[str]:
+        pointer = await self.batches.find_one(
+            {"email": email, "subject": subject, "lesson": lesson, "kind": kind},
+            {"_id": 0, "batch": 1},
+        )
+        return pointer["batch"] if pointer else None
+
+    def _documents(
+        self, lesson: Lesson, kind: str, value: Any, batch: str
+    ) -> List[Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+        common = {
+            **lesson.filter(),
+            "kind": kind,
+            "batch": batch,
+            "subject_name": lesson.subject_name,
+            "lesson_name": lesson.lesson_name,
+            "created_at": now,
+        }
+        if kind in ITEM_KINDS:
+            return [{**common, "item": item} for item in value]
+        return [
+            {**common, **encode_text(section)}
+            for section in split_sections(value, env.MATERIALS_SECTION_CHARS)
+        ]
+
+    async def save(self, lesson: Lesson, materials: Dict[str, Any]) -> Dict[str, int]:
+        """Store each kind in `materials` (items or text); returns counts per kind."""
+        await self._ensure_indexes()
+        saved = {}
+        for kind, value in materials.items():
+            if kind not in KINDS or not value:
+                continue
+            batch = uuid.uuid4().hex
+            # Compressing long notes is CPU work; keep it off the event loop.
+            documents = await asyncio.to_thread(
+                self._documents, lesson, kind, value, batch
+            )
+            await self.collection.insert_many(documents, ordered=True)
+            # The pointer's previous value is the batch this one replaces; a
+            # concurrent save of the same kind deletes the one it replaced, so
+            # whichever flips last keeps its documents.
+            previous = await self.batches.find_one_and_update(
+                {**lesson.filter(), "kind": kind},
+                {"$set": {"batch": batch, "updated_at": documents[0]["created_at"]}},
+                {"_id": 0, "batch": 1},
+                upsert=True,
+            )
+            if previous is not None:
+                await self.collection.delete_many(
+                    {**lesson.filter(), "kind": kind, "batch": previous["batch"]}
+                )
+            saved[kind] = len(documents)
+        return saved
+
+    async def page(
+        self,
+        email: str,
+        subject: str,
+        lesson: str,
+        kind: str,
+        limit: int,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Any], Optional[str]]:
+        """Up to `limit` items after `cursor`, and the cursor for the next page."""
+        batch = await self._current_batch(email, subject, lesson, kind)
+        if batch is None:
+            return [], None
+        query: Dict[str, Any] = {
+            "email": email,
+            "subject": subject,
+            "lesson": lesson,
+            "kind": kind,
+            "batch": batch,
+        }
+        if cursor:
+            try:
+                query["_id"] = {"$gt": ObjectId(cursor)}
+            except InvalidId:
+                raise ValueError("Invalid cursor")
+
+        # One extra document tells whether another page exists.
+        documents = await self.collection.find(
+            query,
+            {"item": 1, "text": 1, "text_z": 1},
+            sort=[("_id", 1)],
+            limit=limit + 1,
+        )
+        more = len(documents) > limit
+        documents = documents[:limit]
+        if kind in ITEM_KINDS:
+            items = [document["item"] for document in documents]
+        else:
+            items = [decode_text(document) for document in documents]
+        next_cursor = str(documents[-1]["_id"]) if more else None
+        return items, next_cursor
+
+    async def lessons(self, email: str, subject: str) -> List[Dict[str, Any]]:
+        """Every stored lesson of a subject with its item count per kind."""
+        pointers = await self.batches.find(
+            {"email": email, "subject": subject}, {"_id": 0, "batch": 1}
+        )
+        if not pointers:
+            return []
+        rows = await self.collection.aggregate(
+            [
+                {
+                    "$match": {
+                        "email": email,
+                        "subject": subject,
+                        "batch": {"$in": [pointer["batch"] for pointer in pointers]},
+                    }
+                },
+                {
+                    "$group": {
+                        "_id": {"lesson": "$lesson", "kind": "$kind"},
+                        "lesson_name": {"$first": "$lesson_name"},
+                        "count": {"$sum": 1},
+                        "updated_at": {"$max": "$created_at"},
+                    }
+                },
+                {"$sort": {"_id.lesson": 1, "_id.kind": 1}},
+            ]
+        )
+        lessons: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            slug = row["_id"]["lesson"]
+            entry = lessons.setdefault(
+                slug,
+                {
+                    "lesson": slug,
+                    "lesson_name": row["lesson_name"],
+                    "counts": {},
+                    "updated_at": row["updated_at"],
+                },
+            )
+            entry["counts"][row["_id"]["kind"]] = row["count"]
+            entry["updated_at"] = max(entry["updated_at"], row["updated_at"])
+        return [
+            {**entry, "updated_at": entry["updated_at"].isoformat()}
+            for entry in lessons.values()
+        ]
+
+
+_material_store: Optional[MaterialStore] = None
+
+
+def get_material_store() -> MaterialStore:
+    global _material_store
+    if _material_store is None:
+        database = get_database()
+        _material_store = MaterialStore(
+            database.StudyMaterials, database.StudyMaterialBatches
+        )
+    return _material_store
+
+
+async def save_materials(
+    lesson: Optional[Lesson], materials: Dict[str, Any]
+) -> Optional[Dict[str, int]]:
+    """Persist freshly generated materials when the request named a lesson.
+
+    A failed save (including a subject the user does not have) is logged
+    rather than raised: the caller still returns what was generated, which
+    cost far more than the write.
+    """
+    if lesson is None:
+        return None
+    try:
+        lesson = await resolve_subject(lesson)
+        return await get_material_store().save(lesson, materials)
+    except Exception as e:
+        log.error("saving materials failed", email=lesson.email, error=str(e))
+        return None
@@ -0,0 +1,204 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+# Seconds; spans a Mongo point read up to a slow multi-minute generation.
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+# A collector returns `(name, type, help, {labels: value})` families at scrape time.
+Family = Tuple[str, str, str, Dict[Labels, float]]
+Collector = Callable[[], Iterable[Family]]
+
+_metrics: List["_Metric"] = []
+_collectors: List[Collector] = []
+_registry_lock = threading.Lock()
+
+
+def _labels(labelnames: Sequence[str], values: Dict[str, str]) -> Labels:
+    return tuple((name, str(values.get(name, ""))) for name in labelnames)
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(
+            name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        for name, value in labels
+    )
+    return "{" + body + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _metrics.append(self)
+
+    def _samples(self) -> Iterator[Tuple[str, Labels, float]]:
+        raise NotImplementedError
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for name, labels, value in self._samples():
+            yield f"{name}{_format_labels(labels)} {_format_value(value)}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = _labels(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in values.items():
+            yield self.name, labels, value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum.
+        self._values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = _labels(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self):
+        with self._lock:
+            values = {key: (list(c), t[0]) for key, (c, t) in self._values.items()}
+        for labels, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    labels + (("le", _format_value(bound)),),
+                    cumulative,
+                )
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+def register_collector(collector: Collector):
+    """Add a callback whose gauges are read fresh on every scrape."""
+    with _registry_lock:
+        _collectors.append(collector)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_metrics)
+        collectors = list(_collectors)
+
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    for collector in collectors:
+        try:
+            families = list(collector())
+        except Exception:
+            continue
+        for name, kind, help, samples in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples.items():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# Shared hot-path metrics.
+HTTP_REQUEST_SECONDS = Histogram(
+    "equilearn_http_request_duration_seconds",
+    "Time to response headers, by route template.",
+    ("method", "route", "status"),
+)
+STAGE_SECONDS = Histogram(
+    "equilearn_stage_duration_seconds",
+    "Time spent per pipeline stage: extract, chunk, llm, parse, mongo.",
+    ("stage",),
+)
+LLM_REQUESTS = Counter(
+    "equilearn_llm_requests_total",
+    "LLM provider calls by outcome.",
+    ("provider", "outcome"),
+)
+LLM_TOKENS = Counter(
+    "equilearn_llm_tokens_total",
+    "Tokens reported by LLM providers.",
+    ("provider", "type"),
+)
+
+
+def timed(stage: str):
+    """Context manager recording one stage's duration."""
+    return STAGE_SECONDS.time(stage=stage)
+
+
+@contextmanager
+def llm_call(provider: str):
+    """Time one provider call and count it as ok or error."""
+    with timed("llm"):
+        try:
+            yield
+        except Exception:
+            LLM_REQUESTS.inc(provider=provider, outcome="error")
+            raise
+    LLM_REQUESTS.inc(provider=provider, outcome="ok")
+
+
+def record_llm_usage(provider: str, prompt_tokens: int, completion_tokens: int):
+    LLM_TOKENS.inc(prompt_tokens or 0, provider=provider, type="prompt")
+    LLM_TOKENS.inc(completion_tokens or 0, provider=provider, type="completion")
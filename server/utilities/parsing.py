@@ -0,0 +1,135 @@
+import json
+import re
+from collections import Counter
+from typing import Any, List, NamedTuple, Optional, Type
+from pydantic import TypeAdapter, ValidationError
+from utilities.metrics import timed
+
+# Process-wide parse counters: how much output was rescued instead of re-generated.
+stats = Counter()
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"\s*")
+_ITEM_BOUNDARY = re.compile(r"[}\]]\s*,\s*[\[{]")
+
+
+class JsonArrayParser:
+    """Incremental parser for the items of one JSON array in model output.
+
+    Feed text as it arrives (a whole response or stream deltas); every call
+    returns the items completed so far. Text before the array, such as prose
+    or a markdown fence, is skipped. A truncated array still yields the items
+    before the cut, and `close` skips over malformed items to the next one.
+    """
+
+    def __init__(self, key: Optional[str] = None):
+        # With `key`, the array is the value of that object member, e.g. the
+        # "flashcards" list inside a combined response.
+        self._start = re.compile(
+            rf'"{re.escape(key)}"\s*:\s*\[' if key else r"\[\s*[\[{\]\"]"
+        )
+        self._buffer = ""
+        self._pos: Optional[int] = None
+        self.complete = False
+        self.failed = False
+        self.skipped = 0
+
+    def feed(self, text: str) -> List[Any]:
+        self._buffer += text
+        if self.complete or self.failed:
+            return []
+        if self._pos is None:
+            match = self._start.search(self._buffer)
+            if match is None:
+                return []
+            self._pos = self._buffer.index("[", match.start()) + 1
+
+        items = []
+        while True:
+            pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if pos >= len(self._buffer):
+                break
+            char = self._buffer[pos]
+            if char == "]":
+                self.complete = True
+                break
+            if char == ",":
+                self._pos = pos + 1
+                continue
+            try:
+                item, end = _decoder.raw_decode(self._buffer, pos)
+            except json.JSONDecodeError:
+                # Either the item is still streaming in or it is malformed;
+                # `close` tells the two apart.
+                break
+            if end == len(self._buffer) and not isinstance(item, (dict, list, str)):
+                # A bare number or literal may still be growing.
+                break
+            items.append(item)
+            self._pos = end
+        return items
+
+    def close(self) -> List[Any]:
+        """End of input: resume after any malformed items and return the rest."""
+        items = []
+        while self._pos is not None and not (self.complete or self.failed):
+            boundary = _ITEM_BOUNDARY.search(self._buffer, self._pos)
+            if boundary is None:
+                self.failed = True
+                break
+            self.skipped += 1
+            self._pos = boundary.start() + 1
+            items.extend(self.feed(""))
+        return items
+
+
+class ParsedItems(NamedTuple):
+    items: List[Any]
+    invalid: int
+    complete: bool
+
+    @property
+    def found(self) -> bool:
+        return bool(self.items) or self.complete
+
+    def missing(self, expected: int = 0) -> int:
+        """Items worth asking for again: invalid ones, a truncated tail, a shortfall."""
+        missing = self.invalid + (0 if self.complete else 1)
+        return max(missing, expected - len(self.items))
+
+
+def parse_items(
+    text: str, item_type: Type[Any], key: Optional[str] = None
+) -> ParsedItems:
+    """Salvage and validate the items of a JSON array in `text`.
+
+    Valid items are returned as plain dicts in order; items failing `item_type`
+    validation are counted, not raised, so one bad item costs only itself.
+    """
+    with timed("parse"):
+        adapter = TypeAdapter(item_type)
+        parser = JsonArrayParser(key)
+        items, invalid = [], 0
+        for raw in parser.feed(text) + parser.close():
+            try:
+                items.append(adapter.dump_python(adapter.validate_python(raw)))
+            except ValidationError:
+                invalid += 1
+        invalid += parser.skipped
+
+    stats["items_parsed"] += len(items)
+    stats["items_invalid"] += invalid
+    if items and (parser.failed or parser.skipped):
+        stats["arrays_salvaged"] += 1
+    return ParsedItems(items, invalid, parser.complete)
+
+
+def find_value(text: str, key: str) -> Optional[Any]:
+    """Decode the value of the first `"key": ...` member in `text`, if complete."""
+    match = re.search(rf'"{re.escape(key)}"\s*:\s*', text)
+    if match is None:
+        return None
+    try:
+        return _decoder.raw_decode(text, match.end())[0]
+    except json.JSONDecodeError:
+        return None
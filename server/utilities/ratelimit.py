@@ -0,0 +1,195 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Set, TypeVar
+from utilities.concurrency import API_POOL, run_blocking
+from utilities.env import get_env
+
+T = TypeVar("T")
+env = get_env()
+
+# Lower runs first. Request handlers are interactive; background jobs mark
+# themselves bulk so a large upload never starves someone waiting on a page.
+INTERACTIVE = 0
+BULK = 1
+request_priority: ContextVar[int] = ContextVar("request_priority", default=INTERACTIVE)
+
+GEMINI = "gemini"
+GROQ = "groq"
+
+# AIMD: halve the allowed rate on every 429, win it back a step per success.
+DECREASE_FACTOR = 0.5
+INCREASE_STEP = 0.02
+MIN_FACTOR = 0.05
+
+
+class RateLimiter:
+    """Token buckets for one provider's requests and tokens per minute.
+
+    Callers wait in `acquire` on the event loop until both buckets cover the
+    call, and only then take an API pool thread, so queued calls never hold
+    threads other work needs. Waiters are served by priority, then arrival
+    order. Limits shrink multiplicatively when the provider still answers 429
+    and grow back additively on success, so sustained load settles just under
+    the provider's real quota. A limit of 0 disables that bucket. One instance
+    serves a whole process; use it from the event loop only.
+    """
+
+    def __init__(self, name: str, rpm: int, tpm: int):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.factor = 1.0
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._waiters = []
+        self._wakeups: Set[asyncio.Future] = set()
+        self._sequence = itertools.count()
+        self.counters = {"acquired": 0, "waited": 0, "rate_limited": 0}
+        self.wait_seconds = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            limit = self.rpm * self.factor
+            self._requests = min(limit, self._requests + elapsed * limit / 60)
+        if self.tpm:
+            limit = self.tpm * self.factor
+            self._tokens = min(limit, self._tokens + elapsed * limit / 60)
+
+    def _wait_time(self, tokens: int) -> float:
+        wait = 0.0
+        if self.rpm and self._requests < 1:
+            wait = (1 - self._requests) * 60 / (self.rpm * self.factor)
+        if self.tpm:
+            # A call bigger than the bucket starts once the bucket is full and
+            # leaves it in debt, rather than waiting forever.
+            limit = self.tpm * self.factor
+            needed = min(tokens, limit)
+            if self._tokens < needed:
+                wait = max(wait, (needed - self._tokens) * 60 / limit)
+        return wait
+
+    def _notify(self):
+        """Wake every waiter to re-check its turn and the buckets."""
+        for wakeup in self._wakeups:
+            if not wakeup.done():
+                wakeup.set_result(None)
+
+    async def _sleep(self, timeout: Optional[float]):
+        """Sleep until `timeout` passes or `_notify` runs, whichever is first."""
+        wakeup = asyncio.get_running_loop().create_future()
+        self._wakeups.add(wakeup)
+        try:
+            await asyncio.wait_for(wakeup, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._wakeups.discard(wakeup)
+
+    async def acquire(self, tokens: int = 0, priority: Optional[int] = None) -> int:
+        """Wait until a call of about `tokens` tokens may start; returns the reservation."""
+        if priority is None:
+            priority = request_priority.get()
+        if not self.tpm:
+            tokens = 0
+
+        started = time.monotonic()
+        entry = (priority, next(self._sequence))
+        heapq.heappush(self._waiters, entry)
+        try:
+            while True:
+                self._refill()
+                timeout = None
+                if self._waiters[0] == entry:
+                    timeout = self._wait_time(tokens)
+                    if timeout <= 0:
+                        self._requests -= 1
+                        self._tokens -= tokens
+                        break
+                await self._sleep(timeout)
+        finally:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+            self._notify()
+
+        waited = time.monotonic() - started
+        self.counters["acquired"] += 1
+        if waited > 0.001:
+            self.counters["waited"] += 1
+            self.wait_seconds += waited
+        return tokens
+
+    def succeeded(self, reserved: int = 0, used: Optional[int] = None):
+        """Record a successful call, charging the real token count when known."""
+        if self.tpm and used is not None:
+            self._tokens -= used - reserved
+        self.factor = min(1.0, self.factor + INCREASE_STEP)
+        self._notify()
+
+    def rate_limited(self):
+        """The provider rejected a call: back off and pause the buckets."""
+        self.counters["rate_limited"] += 1
+        self.factor = max(MIN_FACTOR, self.factor * DECREASE_FACTOR)
+        self._requests = min(self._requests, 0.0)
+        self._tokens = min(self._tokens, 0.0)
+
+    async def call(
+        self,
+        fn: Callable[[], T],
+        tokens: int,
+        is_rate_limited: Callable[[Exception], bool],
+        usage: Optional[Callable[[T], Optional[int]]] = None,
+    ) -> T:
+        """Run one blocking provider call on the API pool once the limiter allows it."""
+        reserved = await self.acquire(tokens)
+        try:
+            result = await run_blocking(API_POOL, fn)
+        except Exception as e:
+            if is_rate_limited(e):
+                self.rate_limited()
+            raise
+        used = None
+        if usage is not None:
+            try:
+                used = usage(result)
+            except Exception:
+                used = None
+        self.succeeded(reserved, used)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "factor": round(self.factor, 3),
+            "queued": len(self._waiters),
+            "wait_seconds": round(self.wait_seconds, 3),
+            **self.counters,
+        }
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+_limits = {
+    GEMINI: (env.GEMINI_RPM, env.GEMINI_TPM),
+    GROQ: (env.GROQ_RPM, env.GROQ_TPM),
+}
+
+
+def get_rate_limiter(provider: str) -> RateLimiter:
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = RateLimiter(provider, *_limits[provider])
+        return _limiters[provider]
+
+
+def rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    with _limiters_lock:
+        return {name: limiter.stats() for name, limiter in _limiters.items()}
@@ -1,10 +1,37 @@
-def generate_unique_slug(base_slug: str, existing_slugs: set) -> str:
-    slug = base_slug
-    counter = 1
-    while slug in existing_slugs:
-        slug = f"{base_slug}-{counter}"
-        counter += 1
-    return slug
+import re
+from typing import Dict, Iterable
+
+_NUMBERED = re.compile(r"^(.*)-(\d+)$")
+
+
+class SlugIndex:
+    """A user's slugs, indexed for constant-time unique slug allocation.
+
+    Built once per request from the slugs already stored. Besides the set of
+    slugs it keeps, per base slug, the highest numeric suffix in use, so a new
+    slug is `base` or `base-(highest + 1)` without probing `base-1`, `base-2`...
+    """
+
+    def __init__(self, existing_slugs: Iterable[str] = ()):
+        self.slugs = set()
+        self.counters: Dict[str, int] = {}
+        for slug in existing_slugs:
+            self.add(slug)
+
+    def add(self, slug: str):
+        self.slugs.add(slug)
+        match = _NUMBERED.match(slug)
+        if match:
+            base, number = match.group(1), int(match.group(2))
+            self.counters[base] = max(self.counters.get(base, 0), number)
+
+    def allocate(self, base_slug: str) -> str:
+        if base_slug in self.slugs:
+            slug = f"{base_slug}-{self.counters.get(base_slug, 0) + 1}"
+        else:
+            slug = base_slug
+        self.add(slug)
+        return slug
 
 
 def subject_exists(subject_name: str, existing_subjects: set) -> bool:
@@ -0,0 +1,9 @@
+import json
+from typing import Any
+
+# Keep proxies (nginx, Vercel) from buffering the stream until it ends.
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
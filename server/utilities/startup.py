@@ -0,0 +1,41 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+from utilities import lazy
+
+# Taken when the app first imports this module, before its routers load.
+_started = time.perf_counter()
+
+
+class StartupProfile:
+    """Where a worker's boot time goes: named phases plus lazy SDK imports."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.ready_after: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + (
+                time.perf_counter() - started
+            )
+
+    def ready(self):
+        self.ready_after = time.perf_counter() - _started
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "ready_seconds": self.ready_after,
+            "phases": {name: round(s, 4) for name, s in self.phases.items()},
+            # Filled in as SDKs are first used, during warm-up or by requests.
+            "lazy_imports": {
+                name: round(s, 4) for name, s in lazy.import_seconds.items()
+            },
+        }
+
+
+profile = StartupProfile()
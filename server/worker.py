@@ -0,0 +1,44 @@
+import argparse
+import asyncio
+import multiprocessing
+import signal
+
+
+def serve(concurrency: int):
+    """Entry point of one worker process: run `concurrency` job loops."""
+    from routes.subjects.cards import JOB_HANDLERS
+    from utilities.jobs import get_job_queue, run_worker
+    from utilities.concurrency import shutdown_executors
+    from utilities.database import close_database
+
+    async def main():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        queue = get_job_queue()
+        await asyncio.gather(
+            *(run_worker(queue, JOB_HANDLERS, stop) for _ in range(concurrency))
+        )
+
+    asyncio.run(main())
+    shutdown_executors()
+    close_database()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run background job workers.")
+    parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--concurrency", type=int, default=1, help="jobs per process")
+    args = parser.parse_args()
+
+    # spawn, not fork: every process must open its own Mongo connections.
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=serve, args=(args.concurrency,))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()